@@ -1,7 +1,228 @@
+import json
 from django.contrib import admin
-from .models import Merchant, Consumer, Return, ReturnItem
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.forms.models import BaseInlineFormSet
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .models import Merchant, Consumer, ConsumerReturnStats, Product, Return, ReturnItem, ReturnStatusEvent, Job
 
-admin.site.register(Merchant)
-admin.site.register(Consumer)
-admin.site.register(Return)
-admin.site.register(ReturnItem)
\ No newline at end of file
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids exact COUNT(*) over large result sets on PostgreSQL.
+
+    Up to `count_limit` rows are counted exactly. Past that, PostgreSQL
+    changelists use the planner's row estimate (pg_class.reltuples when
+    unfiltered, EXPLAIN otherwise), so the last pages may be slightly off or
+    empty but every row stays reachable. Other databases fall back to an
+    exact count.
+    """
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        postgresql = connection.vendor == 'postgresql'
+
+        if postgresql and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] > self.count_limit:
+                return row[0]
+
+        # Small results are cheap to count exactly, and most filtered lists are small
+        count = queryset[:self.count_limit + 1].count()
+        if count <= self.count_limit:
+            return count
+
+        if postgresql:
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return max(int(plan[0]['Plan']['Plan Rows']), count)
+
+        return queryset.count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables too big to count or list in full"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Merchant)
+class MerchantAdmin(admin.ModelAdmin):
+    list_display = ['name', 'email', 'is_active', 'rate_limit_per_minute', 'rate_limit_burst', 'created_at']
+    list_filter = ['is_active']
+    search_fields = ['name', 'email']
+
+
+@admin.register(Consumer)
+class ConsumerAdmin(LargeTableAdmin):
+    list_display = ['email', 'first_name', 'last_name', 'created_at']
+    search_fields = ['=email', 'last_name']
+
+
+@admin.register(ConsumerReturnStats)
+class ConsumerReturnStatsAdmin(LargeTableAdmin):
+    list_display = ['consumer', 'day', 'returns', 'items', 'flagged_items', 'refund_total']
+    list_select_related = ['consumer']
+    raw_id_fields = ['consumer']
+
+
+@admin.register(Product)
+class ProductAdmin(LargeTableAdmin):
+    list_display = ['sku', 'name', 'merchant', 'updated_at']
+    list_select_related = ['merchant']
+    search_fields = ['=sku', 'name']
+    autocomplete_fields = ['merchant']
+
+    def get_search_results(self, request, queryset, search_term):
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        # Product pickers on a return only offer its merchant's catalog
+        merchant_id = request.GET.get('merchant', '')
+        if request.GET.get('field_name') == 'product' and merchant_id.isdigit():
+            queryset = queryset.filter(merchant_id=merchant_id)
+        return queryset, may_have_duplicates
+
+
+class ProductAutocompleteSelect(AutocompleteSelect):
+    """
+    Product picker for a return's items. Searches are limited to `merchant_id`,
+    and the row's own `product` is labelled without querying for it again.
+    """
+    merchant_id = None
+    product = None
+
+    def get_url(self):
+        url = super().get_url()
+        return f'{url}?merchant={self.merchant_id}' if self.merchant_id else url
+
+    def optgroups(self, name, value, attr=None):
+        product = self.product
+        if product is None or {str(v) for v in value if v} != {str(product.pk)}:
+            return super().optgroups(name, value, attr)
+
+        options = [] if self.is_required else [self.create_option(name, '', '', False, 0)]
+        label = self.choices.field.label_from_instance(product)
+        options.append(self.create_option(name, product.pk, label, True, len(options)))
+        return [(None, options, 0)]
+
+
+class ReturnItemFormSet(BaseInlineFormSet):
+    """Hands each row's product picker the return's merchant and the loaded product"""
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        if 'product' not in form.fields:
+            return
+        # Unwrap the admin's add/change links around the widget
+        widget = form.fields['product'].widget
+        widget = getattr(widget, 'widget', widget)
+        widget.merchant_id = self.instance.merchant_id
+        if form.instance.product_id:
+            widget.product = form.instance.product
+
+
+class ReturnItemInline(admin.TabularInline):
+    model = ReturnItem
+    formset = ReturnItemFormSet
+    extra = 0
+    fields = ['product', 'quantity', 'unit_price', 'return_reason', 'condition']
+    autocomplete_fields = ['product']
+
+    def get_queryset(self, request):
+        # Each row's label (ReturnItem.__str__) and product picker read its product
+        return super().get_queryset(request).select_related('product')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'product':
+            kwargs['widget'] = ProductAutocompleteSelect(db_field, self.admin_site, using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+@admin.register(Return)
+class ReturnAdmin(LargeTableAdmin):
+    list_display = ['authorization_code', 'order_number', 'status', 'merchant', 'consumer', 'refund_amount', 'created_at']
+    list_filter = ['status']
+    list_select_related = ['merchant', 'consumer']
+    search_fields = ['=authorization_code', '=order_number']
+    autocomplete_fields = ['merchant', 'consumer']
+    readonly_fields = ['initiated_at', 'status_changed_at', 'completed_at', 'created_at', 'updated_at']
+    inlines = [ReturnItemInline]
+    actions = ['mark_authorized', 'mark_dropped_off', 'mark_processing', 'mark_completed', 'mark_cancelled']
+
+    def _transition(self, request, queryset, to_status, **extra_fields):
+        """Move the selected returns to `to_status` with a single set-based update"""
+        changed = queryset.transition(to_status, **extra_fields)
+        self.message_user(request, f"{len(changed)} return(s) moved to {to_status}.")
+
+    @admin.action(description='Authorize selected initiated returns')
+    def mark_authorized(self, request, queryset):
+        self._transition(request, queryset.filter(status=Return.STATUS_INITIATED), Return.STATUS_AUTHORIZED)
+
+    @admin.action(description='Mark selected authorized returns as dropped off')
+    def mark_dropped_off(self, request, queryset):
+        self._transition(request, queryset.filter(status=Return.STATUS_AUTHORIZED), Return.STATUS_DROPPED_OFF)
+
+    @admin.action(description='Start processing selected dropped off returns')
+    def mark_processing(self, request, queryset):
+        self._transition(request, queryset.filter(status=Return.STATUS_DROPPED_OFF), Return.STATUS_PROCESSING)
+
+    @admin.action(description='Complete selected processing returns')
+    def mark_completed(self, request, queryset):
+        self._transition(
+            request,
+            queryset.filter(status=Return.STATUS_PROCESSING),
+            Return.STATUS_COMPLETED,
+            completed_at=timezone.now()
+        )
+
+    @admin.action(description='Cancel selected returns')
+    def mark_cancelled(self, request, queryset):
+        self._transition(
+            request,
+            queryset.exclude(status__in=[Return.STATUS_COMPLETED, Return.STATUS_CANCELLED]),
+            Return.STATUS_CANCELLED
+        )
+
+
+@admin.register(ReturnItem)
+class ReturnItemAdmin(LargeTableAdmin):
+    list_display = ['return_obj', 'product', 'quantity', 'unit_price', 'return_reason', 'created_at']
+    list_filter = ['return_reason']
+    list_select_related = ['return_obj', 'product']
+    raw_id_fields = ['return_obj']
+    autocomplete_fields = ['product']
+
+
+@admin.register(ReturnStatusEvent)
+class ReturnStatusEventAdmin(LargeTableAdmin):
+    list_display = ['return_obj', 'from_status', 'to_status', 'seconds_in_from_status', 'occurred_at']
+    list_filter = ['to_status']
+    list_select_related = ['return_obj']
+    raw_id_fields = ['return_obj', 'merchant']
+
+    # The log is append-only; rows go away only with their return
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    list_display = ['name', 'status', 'attempts', 'max_attempts', 'run_at', 'updated_at']
+    list_filter = ['status']
+    readonly_fields = ['locked_by', 'locked_at', 'last_error', 'created_at', 'updated_at']
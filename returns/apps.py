@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ReturnsConfig(AppConfig):
     name = 'returns'
+
+    def ready(self):
+        # Register background job handlers and schema extensions
+        from . import schema, tasks  # noqa: F401
@@ -0,0 +1,38 @@
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from .models import Merchant
+
+
+class MerchantAPIKeyAuthentication(BaseAuthentication):
+    """
+    Authenticate merchant integrations by their API key.
+
+    Clients send the header ``Authorization: Api-Key <key>``. On success both
+    request.user and request.auth are the Merchant, so throttles and views can
+    tell which merchant is calling without another query.
+    """
+    keyword = 'Api-Key'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid API key header.')
+
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid API key header.')
+
+        try:
+            merchant = Merchant.objects.get(api_key=key, is_active=True)
+        except Merchant.DoesNotExist:
+            raise exceptions.AuthenticationFailed('Invalid API key.')
+
+        return (merchant, merchant)
+
+    def authenticate_header(self, request):
+        return self.keyword
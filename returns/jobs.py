@@ -0,0 +1,137 @@
+"""
+Database-backed job queue.
+
+Handlers are registered with the @job decorator and queued with enqueue().
+Workers (manage.py run_workers) claim due jobs as threads free up, run them and
+reschedule failures with exponential backoff until max_attempts is reached.
+"""
+import logging
+import random
+import traceback
+import uuid
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Retry delay is BACKOFF_BASE * 2 ** (attempt - 1) seconds, capped
+BACKOFF_BASE = 2
+BACKOFF_MAX = 60 * 60
+
+# Workers refresh locked_at on their running jobs this often; RUNNING jobs
+# not refreshed for STALE_AFTER are assumed lost with their worker
+HEARTBEAT_INTERVAL = timedelta(minutes=1)
+STALE_AFTER = timedelta(minutes=10)
+
+_registry = {}
+
+
+def job(name):
+    """Register a function as the handler for jobs called `name`"""
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, run_at=None, **payload):
+    """Queue a single job; payload must be JSON serializable"""
+    return Job.objects.create(name=name, payload=payload, run_at=run_at or timezone.now())
+
+
+def enqueue_many(name, payloads):
+    """Queue one job per payload with a single insert"""
+    now = timezone.now()
+    return Job.objects.bulk_create([Job(name=name, payload=payload, run_at=now) for payload in payloads])
+
+
+def claim(limit):
+    """
+    Mark up to `limit` due jobs as RUNNING for this worker and return them.
+
+    Candidates are picked with SELECT ... FOR UPDATE SKIP LOCKED where the
+    database supports it, and the final UPDATE only takes rows that are still
+    PENDING, so two workers never claim the same job (on SQLite as well).
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+
+    with transaction.atomic():
+        candidates = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.STATUS_PENDING, run_at__lte=now)
+            .order_by('run_at')
+            .values_list('pk', flat=True)[:limit]
+        )
+        if not candidates:
+            return []
+
+        Job.objects.filter(pk__in=candidates, status=Job.STATUS_PENDING).update(
+            status=Job.STATUS_RUNNING,
+            locked_by=token,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+
+    return list(Job.objects.filter(locked_by=token, status=Job.STATUS_RUNNING))
+
+
+def heartbeat(job_ids):
+    """Mark jobs this worker is still running as alive"""
+    return Job.objects.filter(pk__in=job_ids, status=Job.STATUS_RUNNING).update(locked_at=timezone.now())
+
+
+def release_stale():
+    """
+    Put jobs whose worker died mid-run back on the queue, or fail them if
+    that was their last attempt. Returns the number of jobs released.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.STATUS_RUNNING, locked_at__lt=now - STALE_AFTER)
+
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.STATUS_FAILED,
+        last_error='Worker stopped responding on the final attempt',
+        locked_by='',
+        locked_at=None,
+        updated_at=now,
+    )
+    requeued = stale.update(status=Job.STATUS_PENDING, locked_by='', locked_at=None, updated_at=now)
+    return failed + requeued
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying a job that has failed `attempts` times"""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay + random.uniform(0, delay / 10)
+
+
+def run(job_obj):
+    """Run a claimed job and record the outcome"""
+    handler = _registry.get(job_obj.name)
+
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job {job_obj.name!r}")
+        handler(**job_obj.payload)
+    except Exception:
+        logger.exception("Job %s (%s) failed on attempt %d", job_obj.pk, job_obj.name, job_obj.attempts)
+
+        updates = {'last_error': traceback.format_exc(), 'locked_by': '', 'locked_at': None}
+        if job_obj.attempts >= job_obj.max_attempts:
+            updates['status'] = Job.STATUS_FAILED
+        else:
+            updates['status'] = Job.STATUS_PENDING
+            updates['run_at'] = timezone.now() + timedelta(seconds=backoff(job_obj.attempts))
+    else:
+        updates = {'status': Job.STATUS_SUCCEEDED, 'last_error': '', 'locked_by': '', 'locked_at': None}
+
+    updates['updated_at'] = timezone.now()
+    Job.objects.filter(pk=job_obj.pk).update(**updates)
+
+    for field, value in updates.items():
+        setattr(job_obj, field, value)
+    return job_obj
@@ -0,0 +1,125 @@
+"""
+Printable drop-off labels: a Code128 barcode of the authorization code, as SVG.
+
+Labels depend only on the authorization code, which never changes, so
+rendered output is kept in the 'labels' cache by code. Large batches are
+spread over a process pool; requests share one long-lived pool per process, capped at
+MAX_POOL_WORKERS, so concurrent batches queue for it instead of each
+starting their own processes.
+"""
+import atexit
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import barcode
+from barcode.writer import SVGWriter
+from django.core.cache import caches
+
+CACHE_PREFIX = 'label_svg:'
+CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+# Below this many uncached labels, rendering inline beats the IPC overhead
+POOL_THRESHOLD = 200
+
+# Upper bound on rendering processes shared by a web/API process
+MAX_POOL_WORKERS = 4
+
+WRITER_OPTIONS = {
+    'module_width': 0.3,
+    'module_height': 18.0,
+    'font_size': 12,
+    'quiet_zone': 4.0,
+}
+
+
+def is_printable(code):
+    """Whether `code` can be encoded as Code128, which only covers ASCII"""
+    return bool(code) and code.isascii()
+
+
+def render_label(code):
+    """Render the label for one authorization code as SVG text"""
+    output = io.BytesIO()
+    barcode.get('code128', code, writer=SVGWriter()).write(output, options=WRITER_OPTIONS)
+    return output.getvalue().decode('utf-8')
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _shared_pool_size():
+    return min(os.cpu_count() or 1, MAX_POOL_WORKERS)
+
+
+def _shared_pool():
+    """The process-wide rendering pool, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked: forking a threaded server can deadlock
+            _pool = ProcessPoolExecutor(
+                max_workers=_shared_pool_size(),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def _discard_shared_pool(pool):
+    """Drop a broken shared pool so the next batch starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _render_on_pool(pool, codes, workers):
+    # A few chunks per worker keeps the pool busy without per-label IPC
+    chunksize = max(len(codes) // (workers * 4), 1)
+    return dict(zip(codes, pool.map(render_label, codes, chunksize=chunksize)))
+
+
+def render_labels(codes, workers=None):
+    """
+    Return {code: svg} for the given codes, rendering cache misses in
+    parallel. Codes that can't be encoded (see is_printable) are left out.
+
+    By default large batches go to the shared pool. Passing `workers` (as the
+    render_labels command does) uses a dedicated pool of that size for this
+    call instead; workers=1 renders inline.
+    """
+    codes = [code for code in dict.fromkeys(codes) if is_printable(code)]
+    cache = caches['labels']
+    cached = cache.get_many([CACHE_PREFIX + code for code in codes])
+    labels = {key[len(CACHE_PREFIX):]: svg for key, svg in cached.items()}
+    missing = [code for code in codes if code not in labels]
+
+    shared = workers is None
+    if shared:
+        workers = _shared_pool_size()
+
+    rendered = None
+    if workers > 1 and len(missing) >= POOL_THRESHOLD:
+        if shared:
+            pool = _shared_pool()
+            try:
+                rendered = _render_on_pool(pool, missing, workers)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); finish this batch inline
+                _discard_shared_pool(pool)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                rendered = _render_on_pool(pool, missing, workers)
+    if rendered is None:
+        rendered = {code: render_label(code) for code in missing}
+
+    if rendered:
+        cache.set_many({CACHE_PREFIX + code: svg for code, svg in rendered.items()}, CACHE_TIMEOUT)
+    labels.update(rendered)
+
+    return {code: labels[code] for code in codes}
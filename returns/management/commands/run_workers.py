@@ -0,0 +1,96 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from returns import jobs
+
+
+def _run_in_thread(job_obj):
+    """Run a job on a pool thread, which owns its own database connection"""
+    close_old_connections()
+    try:
+        return jobs.run(job_obj)
+    finally:
+        close_old_connections()
+
+
+def _run_inline(job_obj):
+    """Run a job in this thread, as an already finished future"""
+    future = Future()
+    future.set_result(jobs.run(job_obj))
+    return future
+
+
+def _heartbeat(running, lock, stop):
+    """Keep the job ids in `running` from being released as stale until `stop` is set"""
+    try:
+        while not stop.wait(jobs.HEARTBEAT_INTERVAL.total_seconds()):
+            with lock:
+                job_ids = list(running)
+            if job_ids:
+                jobs.heartbeat(job_ids)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs on a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Number of worker threads')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between polls when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once no jobs are due instead of polling')
+
+    def handle(self, *args, **options):
+        concurrency = max(options['concurrency'], 1)
+        processed = 0
+
+        # A single worker runs jobs in this thread, no pool needed
+        pool = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+        submit = (lambda job_obj: pool.submit(_run_in_thread, job_obj)) if pool else _run_inline
+
+        # Claimed job ids, shared with the heartbeat thread, and their futures
+        running = set()
+        lock = threading.Lock()
+        futures = set()
+        stop = threading.Event()
+        beat = threading.Thread(target=_heartbeat, args=(running, lock, stop), daemon=True)
+        beat.start()
+
+        try:
+            while True:
+                jobs.release_stale()
+
+                # Only claim what there are free threads for, so no job sits
+                # claimed behind a slow one
+                for job_obj in jobs.claim(concurrency - len(futures)):
+                    with lock:
+                        running.add(job_obj.pk)
+                    futures.add(submit(job_obj))
+
+                if not futures:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                # Block until a thread frees up; with threads idle, poll the
+                # queue again after poll_interval
+                timeout = None if len(futures) >= concurrency else options['poll_interval']
+                done, futures = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_obj = future.result()
+                    with lock:
+                        running.discard(job_obj.pk)
+                    processed += 1
+                    self.stdout.write(f"{job_obj} (attempt {job_obj.attempts})")
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping workers')
+        finally:
+            if pool:
+                pool.shutdown(wait=True)
+            stop.set()
+            beat.join()
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} job(s)"))
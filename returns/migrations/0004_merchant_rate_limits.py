@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('returns', '0003_return_returnitem_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='merchant',
+            name='rate_limit_burst',
+            field=models.PositiveIntegerField(default=60),
+        ),
+        migrations.AddField(
+            model_name='merchant',
+            name='rate_limit_per_minute',
+            field=models.PositiveIntegerField(default=600),
+        ),
+    ]
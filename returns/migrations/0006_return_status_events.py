@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-19 19:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('returns', '0005_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='return',
+            name='status_changed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ReturnStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, choices=[('INITIATED', 'Initiated'), ('AUTHORIZED', 'Authorized'), ('DROPPED_OFF', 'Dropped Off'), ('PROCESSING', 'Processing'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], max_length=20)),
+                ('to_status', models.CharField(choices=[('INITIATED', 'Initiated'), ('AUTHORIZED', 'Authorized'), ('DROPPED_OFF', 'Dropped Off'), ('PROCESSING', 'Processing'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], max_length=20)),
+                ('seconds_in_from_status', models.FloatField(blank=True, null=True)),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('merchant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='return_status_events', to='returns.merchant')),
+                ('return_obj', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='returns.return')),
+            ],
+            options={
+                'ordering': ['occurred_at'],
+                'indexes': [models.Index(fields=['merchant', 'from_status', 'occurred_at'], name='returns_ret_merchan_a67a3d_idx'), models.Index(fields=['merchant', 'to_status', 'occurred_at'], name='returns_ret_merchan_e3f607_idx'), models.Index(fields=['return_obj', 'occurred_at'], name='returns_ret_return__934c5f_idx')],
+            },
+        ),
+    ]
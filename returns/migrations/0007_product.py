@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-19 20:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('returns', '0006_return_status_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Product',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sku', models.CharField(max_length=100)),
+                ('name', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('merchant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='products', to='returns.merchant')),
+            ],
+            options={
+                'ordering': ['sku'],
+            },
+        ),
+        migrations.AddField(
+            model_name='returnitem',
+            name='product',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='return_items', to='returns.product'),
+        ),
+        migrations.AddIndex(
+            model_name='returnitem',
+            index=models.Index(fields=['product', 'created_at'], name='returns_ret_product_9316ba_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('merchant', 'sku'), name='unique_product_sku_per_merchant'),
+        ),
+    ]
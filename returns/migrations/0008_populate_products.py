@@ -0,0 +1,84 @@
+# Generated by Django 6.0.1 on 2026-10-19 20:12
+
+from collections import defaultdict
+from django.db import migrations, transaction
+
+BATCH_SIZE = 2000
+
+
+def populate_products(apps, schema_editor):
+    """Point existing return items at catalog entries, one committed batch at a time"""
+    Product = apps.get_model('returns', 'Product')
+    ReturnItem = apps.get_model('returns', 'ReturnItem')
+    last_pk = 0
+
+    while True:
+        batch = list(
+            ReturnItem.objects.filter(pk__gt=last_pk, product__isnull=True)
+            .order_by('pk')
+            .values('pk', 'product_sku', 'product_name', 'return_obj__merchant_id')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_pk = batch[-1]['pk']
+
+        names = defaultdict(dict)
+        for row in batch:
+            names[row['return_obj__merchant_id']][row['product_sku']] = row['product_name']
+
+        with transaction.atomic():
+            product_ids = {}
+            for merchant_id, names_by_sku in names.items():
+                Product.objects.bulk_create(
+                    [Product(merchant_id=merchant_id, sku=sku, name=name) for sku, name in names_by_sku.items()],
+                    ignore_conflicts=True,
+                )
+                for pk, sku in Product.objects.filter(merchant_id=merchant_id, sku__in=names_by_sku).values_list('pk', 'sku'):
+                    product_ids[merchant_id, sku] = pk
+
+            ReturnItem.objects.bulk_update(
+                [
+                    ReturnItem(pk=row['pk'], product_id=product_ids[row['return_obj__merchant_id'], row['product_sku']])
+                    for row in batch
+                ],
+                ['product'],
+            )
+
+
+def restore_product_columns(apps, schema_editor):
+    """Copy catalog names and SKUs back onto return items"""
+    ReturnItem = apps.get_model('returns', 'ReturnItem')
+    last_pk = 0
+
+    while True:
+        batch = list(
+            ReturnItem.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values('pk', 'product__sku', 'product__name')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_pk = batch[-1]['pk']
+
+        with transaction.atomic():
+            ReturnItem.objects.bulk_update(
+                [
+                    ReturnItem(pk=row['pk'], product_sku=row['product__sku'], product_name=row['product__name'])
+                    for row in batch
+                ],
+                ['product_sku', 'product_name'],
+            )
+
+
+class Migration(migrations.Migration):
+
+    # Each batch commits on its own so large tables aren't locked for the whole run
+    atomic = False
+
+    dependencies = [
+        ('returns', '0007_product'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_products, restore_product_columns),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.1 on 2026-10-19 20:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('returns', '0008_populate_products'),
+    ]
+
+    operations = [
+        # Defaults let the columns be re-added to a populated table when unapplied
+        migrations.AlterField(
+            model_name='returnitem',
+            name='product_name',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='returnitem',
+            name='product_sku',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.RemoveField(
+            model_name='returnitem',
+            name='product_name',
+        ),
+        migrations.RemoveField(
+            model_name='returnitem',
+            name='product_sku',
+        ),
+        migrations.AlterField(
+            model_name='returnitem',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, related_name='return_items', to='returns.product'),
+        ),
+    ]
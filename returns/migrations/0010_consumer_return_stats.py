@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-19 21:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('returns', '0009_remove_returnitem_product_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumerReturnStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('returns', models.PositiveIntegerField(default=0)),
+                ('items', models.PositiveIntegerField(default=0)),
+                ('flagged_items', models.PositiveIntegerField(default=0)),
+                ('refund_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('consumer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_return_stats', to='returns.consumer')),
+            ],
+            options={
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('consumer', 'day'), name='unique_consumer_return_stats_day')],
+            },
+        ),
+    ]
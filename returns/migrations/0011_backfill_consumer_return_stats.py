@@ -0,0 +1,60 @@
+# Generated by Django 6.0.1 on 2026-10-19 21:32
+
+from datetime import timedelta
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# Only the scoring windows matter, older history is never read
+BACKFILL_DAYS = 90
+FLAGGED_REASONS = ['UNWANTED', 'WRONG_ITEM']
+
+
+def backfill_stats(apps, schema_editor):
+    """Build daily counters from recent Return history"""
+    Return = apps.get_model('returns', 'Return')
+    ReturnItem = apps.get_model('returns', 'ReturnItem')
+    ConsumerReturnStats = apps.get_model('returns', 'ConsumerReturnStats')
+    since = timezone.now() - timedelta(days=BACKFILL_DAYS)
+
+    stats = {}
+    returns = (
+        Return.objects.filter(created_at__gte=since)
+        .annotate(day=TruncDate('created_at'))
+        .values('consumer_id', 'day')
+        .annotate(returns=Count('id'), refund_total=Sum('refund_amount'))
+        .order_by()
+    )
+    for row in returns:
+        stats[row['consumer_id'], row['day']] = ConsumerReturnStats(
+            consumer_id=row['consumer_id'],
+            day=row['day'],
+            returns=row['returns'],
+            refund_total=row['refund_total'],
+        )
+
+    items = (
+        ReturnItem.objects.filter(return_obj__created_at__gte=since)
+        .annotate(day=TruncDate('return_obj__created_at'))
+        .values('return_obj__consumer_id', 'day')
+        .annotate(items=Count('id'), flagged_items=Count('id', filter=Q(return_reason__in=FLAGGED_REASONS)))
+        .order_by()
+    )
+    for row in items:
+        counters = stats[row['return_obj__consumer_id'], row['day']]
+        counters.items = row['items']
+        counters.flagged_items = row['flagged_items']
+
+    ConsumerReturnStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('returns', '0010_consumer_return_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
 class Merchant(models.Model):
     """Merchant/business that uses the returns platform"""
@@ -6,6 +7,11 @@ class Merchant(models.Model):
     email = models.EmailField(unique=True)
     api_key = models.CharField(max_length=100, unique=True, blank=True)
     is_active = models.BooleanField(default=True)
+
+    # API rate limits (token bucket: sustained rate and bucket capacity)
+    rate_limit_per_minute = models.PositiveIntegerField(default=600)
+    rate_limit_burst = models.PositiveIntegerField(default=60)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -15,6 +21,58 @@ class Merchant(models.Model):
     def __str__(self):
         return self.name
 
+    # A merchant authenticated by API key stands in for request.user
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
+class ConsumerManager(models.Manager):
+    def upsert(self, rows, merchant=None):
+        """
+        Create or update consumers by email, returning {email: Consumer}.
+
+        Email is global, so when a merchant is given only consumers who already
+        have a return at that merchant are updated; other existing consumers
+        are matched but left untouched.
+        """
+        by_email = {row['email']: row for row in rows}
+        if not by_email:
+            return {}
+
+        if merchant is not None:
+            owned = set(
+                self.filter(email__in=by_email, returns__merchant=merchant).values_list('email', flat=True)
+            )
+            if owned:
+                self.bulk_create(
+                    [self.model(**by_email[email]) for email in owned],
+                    update_conflicts=True,
+                    unique_fields=['email'],
+                    update_fields=['first_name', 'last_name'],
+                )
+            self.bulk_create(
+                [self.model(**row) for email, row in by_email.items() if email not in owned],
+                ignore_conflicts=True,
+            )
+            return self.in_bulk(list(by_email), field_name='email')
+
+        # Single statement
+        consumers = self.bulk_create(
+            [self.model(**row) for row in by_email.values()],
+            update_conflicts=True,
+            unique_fields=['email'],
+            update_fields=['first_name', 'last_name'],
+        )
+        if any(consumer.pk is None for consumer in consumers):
+            # Backend can't return ids from an upsert
+            return self.in_bulk(list(by_email), field_name='email')
+        return {consumer.email: consumer for consumer in consumers}
+
+
 class Consumer(models.Model):
     """End customer initiating returns"""
     email = models.EmailField(unique=True)
@@ -22,6 +80,8 @@ class Consumer(models.Model):
     last_name = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ConsumerManager()
+
     class Meta:
         ordering = ['-created_at']
 
@@ -29,6 +89,104 @@ class Consumer(models.Model):
         return f"{self.first_name} {self.last_name} ({self.email})"
 
 
+class ConsumerReturnStats(models.Model):
+    """Per-consumer, per-day return counters kept incrementally for risk scoring, see returns.risk"""
+    consumer = models.ForeignKey(Consumer, on_delete=models.CASCADE, related_name='daily_return_stats')
+    day = models.DateField()
+
+    # Counters
+    returns = models.PositiveIntegerField(default=0)
+    items = models.PositiveIntegerField(default=0)
+    flagged_items = models.PositiveIntegerField(default=0)  # UNWANTED or WRONG_ITEM
+    refund_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['consumer', 'day'], name='unique_consumer_return_stats_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.consumer_id} on {self.day}: {self.returns} return(s)"
+
+
+class ProductManager(models.Manager):
+    def upsert(self, merchant, names_by_sku):
+        """Create or rename a merchant's catalog entries in bulk, returning {sku: Product}"""
+        if not names_by_sku:
+            return {}
+
+        self.bulk_create(
+            [self.model(merchant=merchant, sku=sku, name=name) for sku, name in names_by_sku.items()],
+            update_conflicts=True,
+            unique_fields=['merchant', 'sku'],
+            update_fields=['name', 'updated_at'],
+        )
+        return {product.sku: product for product in self.filter(merchant=merchant, sku__in=names_by_sku)}
+
+
+class Product(models.Model):
+    """Catalog entry for a merchant SKU, shared by every return item of that SKU"""
+    merchant = models.ForeignKey(Merchant, on_delete=models.CASCADE, related_name='products')
+    sku = models.CharField(max_length=100)
+    name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ProductManager()
+
+    class Meta:
+        ordering = ['sku']
+        constraints = [
+            models.UniqueConstraint(fields=['merchant', 'sku'], name='unique_product_sku_per_merchant'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.sku})"
+
+
+class ReturnQuerySet(models.QuerySet):
+    def transition(self, to_status, batch_size=1000, **extra_fields):
+        """
+        Set-based status change for every matching return not already in
+        `to_status`, logging a ReturnStatusEvent and queueing a
+        return_status_changed job per row like Return.save(). Returns the ids
+        that changed.
+        """
+        from . import jobs
+
+        now = timezone.now()
+        changed = []
+
+        with transaction.atomic():
+            rows = list(
+                self.exclude(status=to_status).select_for_update().order_by()
+                .values_list('pk', 'merchant_id', 'status', 'status_changed_at', 'initiated_at')
+            )
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                events = []
+                for pk, merchant_id, from_status, status_changed_at, initiated_at in batch:
+                    entered_at = self.model.status_entered_at(from_status, status_changed_at, initiated_at)
+                    events.append(ReturnStatusEvent(
+                        return_obj_id=pk,
+                        merchant_id=merchant_id,
+                        from_status=from_status,
+                        to_status=to_status,
+                        seconds_in_from_status=(now - entered_at).total_seconds() if entered_at else None,
+                        occurred_at=now,
+                    ))
+                ReturnStatusEvent.objects.bulk_create(events)
+                ids = [row[0] for row in batch]
+                self.model.objects.filter(pk__in=ids).update(
+                    status=to_status, status_changed_at=now, updated_at=now, **extra_fields
+                )
+                jobs.enqueue_many('return_status_changed', [{'return_id': pk, 'status': to_status} for pk in ids])
+                changed.extend(ids)
+
+        return changed
+
+
 class Return(models.Model):
     """Main return transaction"""
 
@@ -62,9 +220,16 @@ class Return(models.Model):
     # Timestamps
     initiated_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    status_changed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Status and refund as last loaded from / saved to the database
+    _saved_status = None
+    _saved_refund_amount = None
+
+    objects = ReturnQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -75,6 +240,113 @@ class Return(models.Model):
     def __str__(self):
         return f"Return {self.authorization_code} - {self.status}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_status = instance.__dict__.get('status')
+        instance._saved_refund_amount = instance.__dict__.get('refund_amount')
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or 'status' in fields:
+            self._saved_status = self.__dict__.get('status')
+        if fields is None or 'refund_amount' in fields:
+            self._saved_refund_amount = self.__dict__.get('refund_amount')
+
+    @classmethod
+    def status_entered_at(cls, from_status, status_changed_at, initiated_at):
+        """
+        When the return entered `from_status`, or None if unknown. Returns
+        saved before status_changed_at existed only know this while they are
+        still in their initial status.
+        """
+        if status_changed_at is not None:
+            return status_changed_at
+        if from_status == cls.STATUS_INITIATED:
+            return initiated_at
+        return None
+
+    def save(self, *args, **kwargs):
+        """
+        Save, logging a ReturnStatusEvent and queueing a return_status_changed
+        job in the same transaction whenever the status changes. New returns
+        and refund edits also update the consumer's risk counters.
+        """
+        from . import jobs, risk
+
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        refund_amount = self._meta.get_field('refund_amount').to_python(self.refund_amount)
+        refund_delta = 0
+        if not adding and self._saved_refund_amount is not None and (
+            update_fields is None or 'refund_amount' in update_fields
+        ):
+            refund_delta = refund_amount - self._saved_refund_amount
+        status_changed = adding or self.status != self._saved_status
+
+        if not (status_changed or refund_delta):
+            return super().save(*args, **kwargs)
+
+        if status_changed:
+            now = timezone.now()
+            from_status = '' if adding else (self._saved_status or '')
+            entered_at = self.status_entered_at(from_status, self.status_changed_at, self.initiated_at)
+            self.status_changed_at = now
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'status_changed_at'}
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if status_changed:
+                ReturnStatusEvent.objects.create(
+                    return_obj=self,
+                    merchant_id=self.merchant_id,
+                    from_status=from_status,
+                    to_status=self.status,
+                    seconds_in_from_status=(now - entered_at).total_seconds() if from_status and entered_at else None,
+                    occurred_at=now,
+                )
+                jobs.enqueue('return_status_changed', return_id=self.pk, status=self.status)
+            if adding:
+                risk.record_return(self, refund_amount)
+            elif refund_delta:
+                risk.record_refund_change(self, refund_delta)
+
+        self._saved_status = self.status
+        self._saved_refund_amount = refund_amount
+
+
+class ReturnStatusEvent(models.Model):
+    """Append-only log entry written by Return.save() for every status change"""
+
+    # Relationships (merchant is copied from the return for per-merchant queries)
+    return_obj = models.ForeignKey(Return, on_delete=models.CASCADE, related_name='status_events')
+    merchant = models.ForeignKey(Merchant, on_delete=models.CASCADE, related_name='return_status_events')
+
+    # Transition details; from_status is blank for the event that creates the return
+    from_status = models.CharField(max_length=20, choices=Return.STATUS_CHOICES, blank=True)
+    to_status = models.CharField(max_length=20, choices=Return.STATUS_CHOICES)
+    seconds_in_from_status = models.FloatField(null=True, blank=True)
+
+    occurred_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['occurred_at']
+        indexes = [
+            models.Index(fields=['merchant', 'from_status', 'occurred_at']),
+            models.Index(fields=['merchant', 'to_status', 'occurred_at']),
+            models.Index(fields=['return_obj', 'occurred_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.return_obj_id}: {self.from_status or '-'} -> {self.to_status}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Return status events are append-only")
+        super().save(*args, **kwargs)
+
 
 class ReturnItem(models.Model):
     """Individual items within a return"""
@@ -109,10 +381,9 @@ class ReturnItem(models.Model):
 
     # Relationships
     return_obj = models.ForeignKey(Return, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.RESTRICT, related_name='return_items')
 
     # Item details
-    product_name = models.CharField(max_length=255)
-    product_sku = models.CharField(max_length=100)
     quantity = models.PositiveIntegerField(default=1)
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     return_reason = models.CharField(max_length=20, choices=REASON_CHOICES)
@@ -122,6 +393,63 @@ class ReturnItem(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['product', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} (x{self.quantity})"
+
+    def save(self, *args, **kwargs):
+        """Save, counting new items towards the consumer's risk counters"""
+        from . import risk
+
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            risk.record_items(self.return_obj, [self])
+
+
+class Job(models.Model):
+    """Background job waiting for (or handled by) the worker pool, see returns.jobs"""
+
+    # Status choices
+    STATUS_PENDING = 'PENDING'
+    STATUS_RUNNING = 'RUNNING'
+    STATUS_SUCCEEDED = 'SUCCEEDED'
+    STATUS_FAILED = 'FAILED'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    # Job details
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    last_error = models.TextField(blank=True)
+
+    # Scheduling and claiming
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
 
     def __str__(self):
-        return f"{self.product_name} (x{self.quantity})"
\ No newline at end of file
+        return f"Job {self.name} #{self.pk} - {self.status}"
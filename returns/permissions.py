@@ -0,0 +1,12 @@
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+from .models import Merchant
+
+
+class ReadOnlyForMerchantKeys(BasePermission):
+    """
+    Merchant API keys may read but not change merchant accounts;
+    creating and editing merchants is left to staff users.
+    """
+
+    def has_permission(self, request, view):
+        return request.method in SAFE_METHODS or not isinstance(request.auth, Merchant)
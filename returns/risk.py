@@ -0,0 +1,134 @@
+"""
+Consumer return-abuse scoring.
+
+Scores are computed from ConsumerReturnStats, one row of counters per
+consumer per day. A score reads at most 90 rows through the (consumer, day)
+index, however long the consumer's history.
+
+Counters are kept on the day the return was created, by Return.save() and
+ReturnItem.save() (plus record_items() for bulk-created items), so every
+writer counts the same way the 0011 backfill did. Refund edits are applied
+to that day's row. Changing an item's reason, deleting items or returns, or
+moving a return to another consumer is not reflected until the counters
+are rebuilt.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import ConsumerReturnStats, ReturnItem
+
+# Reasons that point at buyer's remorse / wardrobing rather than a bad product
+FLAGGED_REASONS = [ReturnItem.REASON_UNWANTED, ReturnItem.REASON_WRONG_ITEM]
+
+SHORT_WINDOW_DAYS = 30
+LONG_WINDOW_DAYS = 90
+
+# Each signal scores its full weight at or above its limit
+RETURNS_SHORT_LIMIT = 5
+RETURNS_LONG_LIMIT = 10
+REFUND_LONG_LIMIT = Decimal('1000.00')
+
+# The flagged-item share only scores in full once there are this many items;
+# one unwanted item says little about a first-time customer
+FLAGGED_SHARE_MIN_ITEMS = 5
+WEIGHTS = {
+    'returns_short': 35,
+    'returns_long': 25,
+    'flagged_share': 25,
+    'refunds': 15,
+}
+
+LEVEL_HIGH = 'HIGH'
+LEVEL_MEDIUM = 'MEDIUM'
+LEVEL_LOW = 'LOW'
+HIGH_THRESHOLD = 60
+MEDIUM_THRESHOLD = 30
+
+
+def _counters(return_obj):
+    """The consumer's counters row for the day `return_obj` was created"""
+    day = timezone.localdate(return_obj.created_at)
+    return ConsumerReturnStats.objects.filter(consumer_id=return_obj.consumer_id, day=day)
+
+
+def _add(return_obj, **increments):
+    """Add `increments` to the return's counters row, creating it if needed"""
+    counters = _counters(return_obj)
+
+    if counters.update(**{field: F(field) + value for field, value in increments.items()}):
+        return
+
+    try:
+        with transaction.atomic():
+            ConsumerReturnStats.objects.create(
+                consumer_id=return_obj.consumer_id,
+                day=timezone.localdate(return_obj.created_at),
+                **increments
+            )
+    except IntegrityError:
+        # Another request created the row first
+        counters.update(**{field: F(field) + value for field, value in increments.items()})
+
+
+def record_return(return_obj, refund_amount):
+    """Count a newly created return and its refund"""
+    _add(return_obj, returns=1, refund_total=refund_amount)
+
+
+def record_items(return_obj, items):
+    """Count items added to a return"""
+    if items:
+        _add(
+            return_obj,
+            items=len(items),
+            flagged_items=sum(1 for item in items if item.return_reason in FLAGGED_REASONS),
+        )
+
+
+def record_refund_change(return_obj, delta):
+    """Apply an edited refund to the counters the return was counted in"""
+    _counters(return_obj).update(refund_total=F('refund_total') + delta)
+
+
+def consumer_risk(consumer_id):
+    """Sliding-window counters and a 0-100 risk score for one consumer"""
+    today = timezone.localdate()
+    short_start = today - timedelta(days=SHORT_WINDOW_DAYS - 1)
+    long_start = today - timedelta(days=LONG_WINDOW_DAYS - 1)
+
+    stats = ConsumerReturnStats.objects.filter(consumer_id=consumer_id, day__gte=long_start).aggregate(
+        returns_30d=Coalesce(Sum('returns', filter=Q(day__gte=short_start)), 0),
+        returns_90d=Coalesce(Sum('returns'), 0),
+        items_90d=Coalesce(Sum('items'), 0),
+        flagged_items_90d=Coalesce(Sum('flagged_items'), 0),
+        refund_total_90d=Sum('refund_total'),
+    )
+    refund_total = stats['refund_total_90d'] or Decimal('0.00')
+    flagged_share = stats['flagged_items_90d'] / stats['items_90d'] if stats['items_90d'] else 0.0
+
+    score = round(
+        WEIGHTS['returns_short'] * min(stats['returns_30d'] / RETURNS_SHORT_LIMIT, 1)
+        + WEIGHTS['returns_long'] * min(stats['returns_90d'] / RETURNS_LONG_LIMIT, 1)
+        + WEIGHTS['flagged_share'] * flagged_share * min(stats['items_90d'] / FLAGGED_SHARE_MIN_ITEMS, 1)
+        + WEIGHTS['refunds'] * min(float(refund_total / REFUND_LONG_LIMIT), 1)
+    )
+
+    if score >= HIGH_THRESHOLD:
+        level = LEVEL_HIGH
+    elif score >= MEDIUM_THRESHOLD:
+        level = LEVEL_MEDIUM
+    else:
+        level = LEVEL_LOW
+
+    return {
+        'consumer': consumer_id,
+        'score': score,
+        'level': level,
+        'returns_30d': stats['returns_30d'],
+        'returns_90d': stats['returns_90d'],
+        'flagged_item_share_90d': flagged_share,
+        'refund_total_90d': refund_total,
+    }
@@ -0,0 +1,15 @@
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+
+
+class MerchantAPIKeyScheme(OpenApiAuthenticationExtension):
+    """Describe merchant API key authentication in the OpenAPI schema"""
+    target_class = 'returns.authentication.MerchantAPIKeyAuthentication'
+    name = 'merchantApiKey'
+
+    def get_security_definition(self, auto_schema):
+        return {
+            'type': 'apiKey',
+            'in': 'header',
+            'name': 'Authorization',
+            'description': 'Merchant API key, prefixed with "Api-Key "',
+        }
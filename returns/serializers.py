@@ -1,5 +1,8 @@
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
-from .models import Merchant, Consumer, Return, ReturnItem
+from .models import Merchant, Consumer, Product, Return, ReturnItem
+from .risk import record_items
 
 
 class MerchantSerializer(serializers.ModelSerializer):
@@ -17,7 +20,59 @@ class ConsumerSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class ConsumerUpsertSerializer(serializers.ModelSerializer):
+    """Consumer details keyed by email, which may already exist"""
+    class Meta:
+        model = Consumer
+        fields = ['email', 'first_name', 'last_name']
+        extra_kwargs = {'email': {'validators': []}}
+
+
+class ConsumerField(serializers.PrimaryKeyRelatedField):
+    """
+    Consumer given by primary key, or as an {email, first_name, last_name}
+    object that is created or updated when the return is saved
+    """
+
+    def get_queryset(self):
+        # Merchant API keys can only pick their own customers by id
+        queryset = super().get_queryset()
+        auth = getattr(self.context.get('request'), 'auth', None)
+        if isinstance(auth, Merchant):
+            queryset = queryset.filter(returns__merchant=auth).distinct()
+        return queryset
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict):
+            serializer = ConsumerUpsertSerializer(data=data)
+            serializer.is_valid(raise_exception=True)
+            return serializer.validated_data
+        return super().to_internal_value(data)
+
+
+class ConsumerRiskSerializer(serializers.Serializer):
+    """Return-abuse score and the sliding-window counters behind it"""
+    consumer = serializers.IntegerField()
+    score = serializers.IntegerField()
+    level = serializers.CharField()
+    returns_30d = serializers.IntegerField()
+    returns_90d = serializers.IntegerField()
+    flagged_item_share_90d = serializers.FloatField()
+    refund_total_90d = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class ProductSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['id', 'merchant', 'sku', 'name', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+
 class ReturnItemSerializer(serializers.ModelSerializer):
+    # Catalog fields are read and written through the shared Product
+    product_name = serializers.CharField(source='product.name', max_length=255)
+    product_sku = serializers.CharField(source='product.sku', max_length=100)
+
     class Meta:
         model = ReturnItem
         fields = [
@@ -34,6 +89,7 @@ class ReturnItemSerializer(serializers.ModelSerializer):
 
 
 class ReturnSerializer(serializers.ModelSerializer):
+    consumer = ConsumerField(queryset=Consumer.objects.all())
     items = ReturnItemSerializer(many=True)
 
     class Meta:
@@ -54,11 +110,51 @@ class ReturnSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'initiated_at', 'created_at', 'updated_at']
 
+    def validate_merchant(self, merchant):
+        request = self.context.get('request')
+        auth = getattr(request, 'auth', None)
+        if isinstance(auth, Merchant) and merchant != auth:
+            raise serializers.ValidationError('API keys can only file returns for their own merchant.')
+        return merchant
+
+    def _resolve_consumer(self, validated_data):
+        """Swap a consumer given as {email, ...} for the upserted Consumer row"""
+        consumer = validated_data.get('consumer')
+        if isinstance(consumer, dict):
+            auth = getattr(self.context.get('request'), 'auth', None)
+            merchant = auth if isinstance(auth, Merchant) else None
+            validated_data['consumer'] = Consumer.objects.upsert([consumer], merchant=merchant)[consumer['email']]
+
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        return_obj = Return.objects.create(**validated_data)
 
-        for item_data in items_data:
-            ReturnItem.objects.create(return_obj=return_obj, **item_data)
+        with transaction.atomic():
+            self._resolve_consumer(validated_data)
+            return_obj = Return.objects.create(**validated_data)
+
+            products = Product.objects.upsert(
+                return_obj.merchant,
+                {item['product']['sku']: item['product']['name'] for item in items_data}
+            )
+            items = ReturnItem.objects.bulk_create([
+                ReturnItem(return_obj=return_obj, **{**item_data, 'product': products[item_data['product']['sku']]})
+                for item_data in items_data
+            ])
+            record_items(return_obj, items)
+
+        # Load the items back with their products in one query for the response
+        prefetch_related_objects(
+            [return_obj],
+            Prefetch('items', queryset=ReturnItem.objects.select_related('product'))
+        )
+        return return_obj
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            self._resolve_consumer(validated_data)
+            return super().update(instance, validated_data)
+
 
-        return return_obj
\ No newline at end of file
+class LabelRequestSerializer(serializers.Serializer):
+    """Batch of returns to print drop-off labels for"""
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=10000)
@@ -0,0 +1,19 @@
+"""Job handlers, run on the worker pool rather than in requests"""
+import logging
+from .jobs import job
+from .models import Return
+
+logger = logging.getLogger(__name__)
+
+
+@job('return_status_changed')
+def return_status_changed(return_id, status):
+    """Record a return's status change; downstream notifications hook in here"""
+    return_obj = Return.objects.select_related('merchant', 'consumer').filter(pk=return_id).first()
+    if return_obj is None:
+        return
+
+    logger.info(
+        "Return %s for %s (%s) is now %s",
+        return_obj.authorization_code, return_obj.merchant, return_obj.consumer.email, status
+    )
@@ -1,9 +1,64 @@
-from django.test import TestCase #QUESTION: what are the important methods defined in TestCase?
+import gzip
+import json
+import tempfile
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+import msgpack
+from django.db import connection
+from django.db.models import RestrictedError
+from django.test import TestCase, TransactionTestCase #QUESTION: what are the important methods defined in TestCase?
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase, APIClient
 from rest_framework.authtoken.models import Token
 from rest_framework import status
-from .models import Merchant, Consumer, Return, ReturnItem
+from rest_framework.renderers import JSONRenderer
+from django.core.cache import caches
+from django.core.management import call_command
+from django.utils import timezone
+from . import jobs, labels
+from .models import Merchant, Consumer, ConsumerReturnStats, Product, Return, ReturnItem, Job, ReturnStatusEvent
+from .admin import EstimatedCountPaginator
+from .renderers import ORJSONRenderer, MessagePackRenderer
+from .serializers import ReturnSerializer
+from .throttling import MerchantRateThrottle
+
+
+def item(sku='SKU-1', name='Shirt', reason='UNWANTED'):
+    """One return item as posted to /api/returns/"""
+    return {
+        'product_name': name,
+        'product_sku': sku,
+        'quantity': 1,
+        'unit_price': '10.00',
+        'return_reason': reason
+    }
+
+
+class ReturnFilingTestCase(APITestCase):
+    """Base for tests that file returns through the API as a staff user"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(self.user)
+        self.merchant = Merchant.objects.create(name='Test Store', email='test@store.com')
+        self.consumer = Consumer.objects.create(email='customer@test.com', first_name='John', last_name='Doe')
+
+    def create_return(self, code, items=None, consumer=None, refund='10.00'):
+        """POST a return for self.merchant; consumer defaults to self.consumer and may be an id or a dict"""
+        return self.client.post('/api/returns/', {
+            'merchant': self.merchant.id,
+            'consumer': self.consumer.id if consumer is None else consumer,
+            'order_number': f'ORD-{code}',
+            'authorization_code': code,
+            'refund_amount': refund,
+            'items': [item()] if items is None else items
+        }, format='json')
 
 
 class MerchantModelTest(TestCase):
@@ -77,16 +132,20 @@ class ReturnModelTest(TestCase):
 
     def test_return_with_items(self):
         """Test return with nested items"""
+        product = Product.objects.create(
+            merchant=self.merchant,
+            name="Test Product",
+            sku="SKU-123"
+        )
         item = ReturnItem.objects.create(
             return_obj=self.return_obj, #QUESTION: Why are we creating a variable return_obj to reference its own return_obj attribute?
-            product_name="Test Product",
-            product_sku="SKU-123",
+            product=product,
             quantity=2,
             unit_price=49.99,
             return_reason=ReturnItem.REASON_UNWANTED
         )
         self.assertEqual(self.return_obj.items.count(), 1) #QUESTION: Why are we asking if the quantity is 1 when we know it's 2?
-        self.assertEqual(item.product_name, "Test Product")
+        self.assertEqual(item.product.name, "Test Product")
 
 
 class MerchantAPITest(APITestCase): #QUESTION: What is the point of using APITestCase rather than TestCase? What are the attributes of an instance of APITestCase?
@@ -240,4 +299,1009 @@ class ReturnAPITest(APITestCase):
         response = self.client.post(f'/api/returns/{return_obj.id}/cancel/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         return_obj.refresh_from_db()
-        self.assertEqual(return_obj.status, Return.STATUS_CANCELLED) #QUESTION: So if a return gets cancelled, it doesn't get deleted? It just sits in the database with a status of STATUS_CANCELLED?
\ No newline at end of file
+        self.assertEqual(return_obj.status, Return.STATUS_CANCELLED) #QUESTION: So if a return gets cancelled, it doesn't get deleted? It just sits in the database with a status of STATUS_CANCELLED?
+
+
+class MerchantRateThrottleTest(APITestCase):
+    """Test per-merchant token bucket rate limiting"""
+
+    def setUp(self):
+        caches['throttle'].clear()
+        self.merchant = Merchant.objects.create(
+            name='Test Store',
+            email='test@store.com',
+            api_key='merchant-key',
+            rate_limit_per_minute=60,
+            rate_limit_burst=2
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key merchant-key')
+
+    def test_api_key_authenticates_merchant(self):
+        """Test merchant API key grants access and reports quota"""
+        response = self.client.get('/api/returns/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-RateLimit-Limit'], '2')
+        self.assertEqual(response['X-RateLimit-Remaining'], '1')
+
+    def test_invalid_api_key_rejected(self):
+        """Test unknown API keys are refused"""
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key wrong-key')
+        response = self.client.get('/api/returns/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_burst_exhausted_returns_429(self):
+        """Test requests beyond the burst are throttled with Retry-After"""
+        self.client.get('/api/returns/')
+        self.client.get('/api/returns/')
+        response = self.client.get('/api/returns/')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(response['X-RateLimit-Remaining'], '0')
+
+    def test_merchants_have_separate_buckets(self):
+        """Test one merchant exhausting its bucket doesn't affect another"""
+        Merchant.objects.create(name='Other Store', email='other@store.com', api_key='other-key')
+        for _ in range(3):
+            self.client.get('/api/returns/')
+
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key other-key')
+        response = self.client.get('/api/returns/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bulk_label_rendering_keeps_buckets(self):
+        """Test filling the label cache doesn't reset anyone's quota"""
+        self.client.get('/api/returns/')
+        self.client.get('/api/returns/')
+
+        labels.render_labels([f'RET-{i:04d}' for i in range(400)], workers=1)
+
+        response = self.client.get('/api/returns/')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_bucket_refills_over_time(self):
+        """Test tokens are replenished at the merchant's rate"""
+        throttle = MerchantRateThrottle()
+        now = [1000.0]
+        throttle.timer = lambda: now[0]
+        request = APIClient().get('/').wsgi_request
+        request.auth = self.merchant
+
+        self.assertTrue(throttle.allow_request(request, None))
+        self.assertTrue(throttle.allow_request(request, None))
+        self.assertFalse(throttle.allow_request(request, None))
+        self.assertAlmostEqual(throttle.wait(), 1.0)
+
+        now[0] += 1.0
+        self.assertTrue(throttle.allow_request(request, None))
+        self.assertFalse(throttle.allow_request(request, None))
+
+    def test_throttle_overhead_benchmark(self):
+        """Benchmark: the limiter adds well under a millisecond per request"""
+        self.merchant.rate_limit_per_minute = 60_000_000
+        self.merchant.rate_limit_burst = 1_000_000
+        throttle = MerchantRateThrottle()
+        request = APIClient().get('/').wsgi_request
+        request.auth = self.merchant
+
+        iterations = 5000
+        start = time.perf_counter()
+        for _ in range(iterations):
+            throttle.allow_request(request, None)
+        per_call = (time.perf_counter() - start) / iterations
+
+        self.assertLess(per_call, 0.0005)
+
+
+class MerchantAPIKeyScopeTest(APITestCase):
+    """Test merchant API keys only reach their own merchant's data"""
+
+    def setUp(self):
+        caches['throttle'].clear()
+        self.merchant = Merchant.objects.create(name='Test Store', email='test@store.com', api_key='merchant-key')
+        self.other = Merchant.objects.create(name='Other Store', email='other@store.com', api_key='other-key')
+        self.consumer = Consumer.objects.create(email='customer@test.com', first_name='John', last_name='Doe')
+        self.other_consumer = Consumer.objects.create(email='else@test.com', first_name='Jane', last_name='Roe')
+        self.own_return = Return.objects.create(
+            merchant=self.merchant, consumer=self.consumer, order_number='ORD-1',
+            authorization_code='RET-1', refund_amount=10
+        )
+        self.other_return = Return.objects.create(
+            merchant=self.other, consumer=self.other_consumer, order_number='ORD-2',
+            authorization_code='RET-2', refund_amount=10
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Api-Key merchant-key')
+
+    def test_lists_only_own_rows(self):
+        """Test returns, consumers and merchants are filtered to the key's merchant"""
+        returns = self.client.get('/api/returns/').json()
+        self.assertEqual([row['id'] for row in returns['results']], [self.own_return.id])
+
+        consumers = self.client.get('/api/consumers/').json()
+        self.assertEqual([row['id'] for row in consumers['results']], [self.consumer.id])
+
+        merchants = self.client.get('/api/merchants/').json()
+        self.assertEqual([row['id'] for row in merchants['results']], [self.merchant.id])
+
+    def test_other_merchants_rows_not_found(self):
+        """Test another merchant's return can't be read or changed"""
+        response = self.client.get(f'/api/returns/{self.other_return.id}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.post(f'/api/returns/{self.other_return.id}/cancel/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.other_return.refresh_from_db()
+        self.assertEqual(self.other_return.status, Return.STATUS_INITIATED)
+
+    def test_cannot_file_return_for_other_merchant(self):
+        """Test creating a return under another merchant is rejected"""
+        response = self.client.post('/api/returns/', {
+            'merchant': self.other.id,
+            'consumer': self.consumer.id,
+            'order_number': 'ORD-3',
+            'authorization_code': 'RET-3',
+            'refund_amount': '10.00',
+            'items': [],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('merchant', response.json())
+
+    def test_products_limited_to_own_catalog(self):
+        """Test another merchant's products can't be listed or read"""
+        own = Product.objects.create(merchant=self.merchant, sku='SKU-1', name='Shirt')
+        other = Product.objects.create(merchant=self.other, sku='SKU-1', name='Shirt')
+
+        products = self.client.get('/api/products/').json()
+        self.assertEqual([row['id'] for row in products['results']], [own.id])
+
+        response = self.client.get(f'/api/products/{other.id}/return-stats/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_labels_only_for_own_returns(self):
+        """Test label batches skip other merchants' returns"""
+        response = self.client.post('/api/returns/labels/', {'ids': [self.other_return.id, self.own_return.id]}, format='json')
+        self.assertEqual([label['id'] for label in response.json()], [self.own_return.id])
+
+    def test_cannot_rename_other_merchants_consumers(self):
+        """Test inline and bulk upserts by email leave other merchants' customers alone"""
+        response = self.client.post('/api/returns/', {
+            'merchant': self.merchant.id,
+            'consumer': {'email': 'else@test.com', 'first_name': 'Mallory', 'last_name': 'X'},
+            'order_number': 'ORD-3',
+            'authorization_code': 'RET-3',
+            'refund_amount': '10.00',
+            'items': [],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['consumer'], self.other_consumer.id)
+
+        response = self.client.post('/api/consumers/bulk-upsert/', [
+            {'email': 'customer@test.com', 'first_name': 'Johnny', 'last_name': 'Doe'},
+            {'email': 'nobody@test.com', 'first_name': 'Mallory', 'last_name': 'X'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), 2)
+
+        self.other_consumer.refresh_from_db()
+        self.assertEqual(self.other_consumer.first_name, 'Jane')
+        self.assertEqual(Consumer.objects.get(email='customer@test.com').first_name, 'Johnny')
+        self.assertEqual(Consumer.objects.get(email='nobody@test.com').first_name, 'Mallory')
+
+    def test_cannot_attach_other_merchants_consumer_by_id(self):
+        """Test a consumer id from another merchant is rejected"""
+        response = self.client.post('/api/returns/', {
+            'merchant': self.merchant.id,
+            'consumer': self.other_consumer.id,
+            'order_number': 'ORD-3',
+            'authorization_code': 'RET-3',
+            'refund_amount': '10.00',
+            'items': [],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('consumer', response.json())
+
+        response = self.client.patch(f'/api/returns/{self.own_return.id}/', {'consumer': self.consumer.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_merchant_accounts_read_only(self):
+        """Test merchant keys can't create or edit merchants"""
+        response = self.client.patch(f'/api/merchants/{self.merchant.id}/', {'name': 'Renamed'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.post('/api/merchants/', {'name': 'New', 'email': 'new@store.com'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_status_durations_limited_to_own_merchant(self):
+        """Test another merchant's status durations are refused"""
+        response = self.client.get('/api/returns/status-durations/', {'merchant': self.other.id})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.get('/api/returns/status-durations/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['merchant'], self.merchant.id)
+
+
+calls = []
+
+
+@jobs.job('tests.record')
+def record_job(value):
+    calls.append(value)
+
+
+@jobs.job('tests.fail')
+def failing_job():
+    raise RuntimeError('boom')
+
+
+fast_jobs_done = threading.Event()
+
+
+@jobs.job('tests.slow')
+def slow_job():
+    # Only finishes early if the other thread kept picking up jobs meanwhile
+    calls.append('slow' if fast_jobs_done.wait(timeout=5) else 'slow timed out')
+
+
+@jobs.job('tests.fast')
+def fast_job(value, last):
+    calls.append(value)
+    if value == last:
+        fast_jobs_done.set()
+
+
+class JobQueueTest(APITestCase):
+    """Test the background job queue and worker command"""
+
+    def setUp(self):
+        calls.clear()
+
+    def run_workers(self, concurrency=1):
+        call_command('run_workers', '--once', f'--concurrency={concurrency}', stdout=StringIO())
+
+    def test_run_workers_processes_due_jobs(self):
+        """Test workers run pending jobs and mark them succeeded"""
+        job = jobs.enqueue('tests.record', value=1)
+        jobs.enqueue('tests.record', value=2, run_at=timezone.now() + timedelta(hours=1))
+
+        self.run_workers()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(calls, [1])
+
+    def test_failed_job_retried_with_backoff(self):
+        """Test a failing job is rescheduled, then given up after max_attempts"""
+        job = jobs.enqueue('tests.fail')
+        Job.objects.filter(pk=job.pk).update(max_attempts=2)
+
+        with self.assertLogs('returns.jobs', level='ERROR'):
+            self.run_workers()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_PENDING)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('RuntimeError', job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('returns.jobs', level='ERROR'):
+            self.run_workers()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_release_stale_requeues_or_fails(self):
+        """Test jobs lost with their worker are retried, unless out of attempts"""
+        retry = jobs.enqueue('tests.record', value=1)
+        last = jobs.enqueue('tests.record', value=2)
+        Job.objects.filter(pk=last.pk).update(max_attempts=1)
+        jobs.claim(10)
+        Job.objects.update(locked_at=timezone.now() - jobs.STALE_AFTER - timedelta(seconds=1))
+
+        self.assertEqual(jobs.release_stale(), 2)
+
+        retry.refresh_from_db()
+        last.refresh_from_db()
+        self.assertEqual(retry.status, Job.STATUS_PENDING)
+        self.assertEqual(last.status, Job.STATUS_FAILED)
+        self.assertEqual(last.locked_by, '')
+
+    def test_heartbeat_keeps_long_jobs_claimed(self):
+        """Test a job whose worker is still beating is not released"""
+        job = jobs.enqueue('tests.record', value=1)
+        jobs.claim(10)
+        Job.objects.update(locked_at=timezone.now() - jobs.STALE_AFTER - timedelta(seconds=1))
+
+        jobs.heartbeat([job.pk])
+
+        self.assertEqual(jobs.release_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_RUNNING)
+
+    def test_single_worker_claims_one_job_at_a_time(self):
+        """Test workers only claim as many jobs as they have free threads"""
+        for value in range(3):
+            jobs.enqueue('tests.record', value=value)
+
+        with mock.patch.object(jobs, 'claim', wraps=jobs.claim) as claim:
+            self.run_workers()
+
+        self.assertEqual(calls, [0, 1, 2])
+        self.assertEqual({call.args[0] for call in claim.call_args_list}, {1})
+
+    def test_claimed_job_not_claimed_twice(self):
+        """Test a job claimed by one worker is invisible to the next"""
+        jobs.enqueue('tests.record', value=1)
+        self.assertEqual(len(jobs.claim(10)), 1)
+        self.assertEqual(jobs.claim(10), [])
+
+    def test_return_transitions_enqueue_jobs(self):
+        """Test status changes queue side effects instead of running them inline"""
+        user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user)
+        merchant = Merchant.objects.create(name='Test Store', email='test@store.com')
+        consumer = Consumer.objects.create(email='customer@test.com', first_name='John', last_name='Doe')
+        return_obj = Return.objects.create(
+            merchant=merchant,
+            consumer=consumer,
+            order_number='ORD-1',
+            authorization_code='RET-1',
+            refund_amount=50.00
+        )
+
+        self.client.post(f'/api/returns/{return_obj.id}/cancel/')
+
+        payloads = list(Job.objects.filter(name='return_status_changed').order_by('pk').values_list('payload', flat=True))
+        self.assertEqual(payloads, [
+            {'return_id': return_obj.id, 'status': Return.STATUS_INITIATED},
+            {'return_id': return_obj.id, 'status': Return.STATUS_CANCELLED},
+        ])
+
+    def test_status_edit_enqueues_job(self):
+        """Test changing status through a plain update also queues side effects"""
+        user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(user)
+        merchant = Merchant.objects.create(name='Test Store', email='test@store.com')
+        consumer = Consumer.objects.create(email='customer@test.com', first_name='John', last_name='Doe')
+        return_obj = Return.objects.create(
+            merchant=merchant,
+            consumer=consumer,
+            order_number='ORD-1',
+            authorization_code='RET-1',
+            refund_amount=50.00
+        )
+
+        self.client.patch(f'/api/returns/{return_obj.id}/', {'status': Return.STATUS_AUTHORIZED}, format='json')
+        self.client.patch(f'/api/returns/{return_obj.id}/', {'order_number': 'ORD-1B'}, format='json')
+
+        payloads = list(Job.objects.order_by('pk').values_list('payload', flat=True))
+        self.assertEqual(payloads[-1], {'return_id': return_obj.id, 'status': Return.STATUS_AUTHORIZED})
+        self.assertEqual(len(payloads), 2)
+
+
+
+class WorkerPoolTest(TransactionTestCase):
+    """Test the worker pool on real threads, which need committed jobs"""
+
+    def setUp(self):
+        calls.clear()
+        fast_jobs_done.clear()
+
+    def test_free_thread_keeps_working_past_slow_job(self):
+        """Test one slow job doesn't hold back jobs claimed after it"""
+        jobs.enqueue('tests.slow')
+        jobs.enqueue_many('tests.fast', [{'value': value, 'last': 3} for value in range(4)])
+
+        call_command('run_workers', '--once', '--concurrency=2', '--poll-interval=0.05', stdout=StringIO())
+
+        self.assertEqual(sorted(calls, key=str), [0, 1, 2, 3, 'slow'])
+        self.assertEqual(Job.objects.filter(status=Job.STATUS_SUCCEEDED).count(), 5)
+
+class ReturnStatusEventTest(APITestCase):
+    """Test the status history log and SLA duration report"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(self.user)
+        self.merchant = Merchant.objects.create(name='Test Store', email='test@store.com')
+        self.consumer = Consumer.objects.create(email='customer@test.com', first_name='John', last_name='Doe')
+        self.return_obj = Return.objects.create(
+            merchant=self.merchant,
+            consumer=self.consumer,
+            order_number='ORD-1',
+            authorization_code='RET-1',
+            refund_amount=50.00
+        )
+
+    def test_events_written_for_status_changes(self):
+        """Test creation and each transition append an event"""
+        self.client.post(f'/api/returns/{self.return_obj.id}/approve/')
+        self.return_obj.refresh_from_db()
+        self.return_obj.order_number = 'ORD-1B'
+        self.return_obj.save()
+
+        events = list(self.return_obj.status_events.values_list('from_status', 'to_status'))
+        self.assertEqual(events, [('', Return.STATUS_INITIATED), (Return.STATUS_INITIATED, Return.STATUS_AUTHORIZED)])
+        self.assertIsNotNone(self.return_obj.status_changed_at)
+
+    def test_legacy_return_duration_unknown(self):
+        """Test returns without status_changed_at only fall back to initiated_at from INITIATED"""
+        Return.objects.filter(pk=self.return_obj.pk).update(
+            status=Return.STATUS_PROCESSING, status_changed_at=None
+        )
+        legacy = Return.objects.get(pk=self.return_obj.pk)
+        legacy.status = Return.STATUS_COMPLETED
+        legacy.save()
+
+        event = legacy.status_events.get(to_status=Return.STATUS_COMPLETED)
+        self.assertIsNone(event.seconds_in_from_status)
+
+        Return.objects.filter(pk=self.return_obj.pk).update(
+            status=Return.STATUS_INITIATED, status_changed_at=None
+        )
+        legacy = Return.objects.get(pk=self.return_obj.pk)
+        legacy.status = Return.STATUS_AUTHORIZED
+        legacy.save()
+
+        event = legacy.status_events.get(to_status=Return.STATUS_AUTHORIZED)
+        self.assertIsNotNone(event.seconds_in_from_status)
+
+    def test_events_are_append_only(self):
+        """Test saved events can't be modified"""
+        event = self.return_obj.status_events.get()
+        event.to_status = Return.STATUS_COMPLETED
+        with self.assertRaises(ValueError):
+            event.save()
+
+    def test_status_durations(self):
+        """Test percentiles of time spent in each status"""
+        now = timezone.now()
+        ReturnStatusEvent.objects.bulk_create([
+            ReturnStatusEvent(
+                return_obj=self.return_obj,
+                merchant=self.merchant,
+                from_status=Return.STATUS_INITIATED,
+                to_status=Return.STATUS_AUTHORIZED,
+                seconds_in_from_status=seconds,
+                occurred_at=now - timedelta(hours=1)
+            )
+            for seconds in range(1, 101)
+        ])
+
+        response = self.client.get(f'/api/returns/status-durations/?merchant={self.merchant.id}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        initiated = response.data['statuses'][0]
+        self.assertEqual(initiated['status'], Return.STATUS_INITIATED)
+        self.assertEqual(initiated['count'], 100)
+        self.assertEqual(initiated['p50'], 50)
+        self.assertEqual(initiated['p90'], 90)
+        self.assertEqual(initiated['max'], 100)
+        self.assertEqual(response.data['statuses'][1]['count'], 0)
+
+    def test_status_durations_requires_merchant(self):
+        """Test the report needs a merchant"""
+        response = self.client.get('/api/returns/status-durations/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_status_durations_benchmark(self):
+        """Benchmark: a month of events for a busy merchant reports in well under a second"""
+        now = timezone.now()
+        flow = [Return.STATUS_INITIATED, Return.STATUS_AUTHORIZED, Return.STATUS_DROPPED_OFF, Return.STATUS_PROCESSING]
+        ReturnStatusEvent.objects.bulk_create([
+            ReturnStatusEvent(
+                return_obj=self.return_obj,
+                merchant=self.merchant,
+                from_status=flow[i % 4],
+                to_status=Return.STATUS_COMPLETED,
+                seconds_in_from_status=float(i % 86400),
+                occurred_at=now - timedelta(seconds=i * 60)
+            )
+            for i in range(40000)
+        ], batch_size=5000)
+
+        start = time.perf_counter()
+        response = self.client.get(f'/api/returns/status-durations/?merchant={self.merchant.id}')
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLess(elapsed, 0.5)
+
+
+class ProductCatalogTest(ReturnFilingTestCase):
+    """Test return items share per-merchant catalog entries"""
+
+    def test_items_share_products(self):
+        """Test repeated SKUs reuse one Product and names are upserted"""
+        self.create_return('RET-1', [item('SKU-1', 'Shirt'), item('SKU-2', 'Hat')])
+        response = self.create_return('RET-2', [item('SKU-1', 'Shirt v2')])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['items'][0]['product_sku'], 'SKU-1')
+        self.assertEqual(response.data['items'][0]['product_name'], 'Shirt v2')
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual(Product.objects.get(sku='SKU-1').return_items.count(), 2)
+
+    def test_create_return_query_count_is_constant(self):
+        """Test the number of items doesn't change the number of queries"""
+        # The consumer's first return of the day also creates its risk counters row
+        self.create_return('RET-0', [item('SKU-0', 'Socks')])
+
+        with CaptureQueriesContext(connection) as one_item:
+            self.create_return('RET-1', [item('SKU-1', 'Shirt')])
+        with CaptureQueriesContext(connection) as many_items:
+            self.create_return('RET-2', [item(f'SKU-{i}', f'Item {i}') for i in range(20)])
+
+        self.assertEqual(len(many_items.captured_queries), len(one_item.captured_queries))
+
+    def test_delete_merchant_with_returns(self):
+        """Test a merchant's catalog goes with it, but a product in use can't be deleted alone"""
+        self.create_return('RET-1', [item('SKU-1', 'Shirt')])
+
+        with self.assertRaises(RestrictedError):
+            Product.objects.get(sku='SKU-1').delete()
+
+        response = self.client.delete(f'/api/merchants/{self.merchant.id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(ReturnItem.objects.exists())
+
+    def test_return_stats(self):
+        """Test per-SKU return counts"""
+        self.create_return('RET-1', [item('SKU-1', 'Shirt')])
+        self.create_return('RET-2', [item('SKU-1', 'Shirt')])
+        product = Product.objects.get(sku='SKU-1')
+
+        response = self.client.get(f'/api/products/{product.id}/return-stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['items'], 2)
+        self.assertEqual(response.data['by_reason']['UNWANTED']['units'], 2)
+
+
+class ConsumerUpsertTest(ReturnFilingTestCase):
+    """Test bulk consumer upsert and inline consumer resolution"""
+
+    def test_bulk_upsert_creates_and_updates(self):
+        """Test consumers are matched by email"""
+        Consumer.objects.create(email='old@test.com', first_name='Old', last_name='Name')
+        data = [
+            {'email': 'old@test.com', 'first_name': 'New', 'last_name': 'Name'},
+            {'email': 'fresh@test.com', 'first_name': 'Jane', 'last_name': 'Smith'},
+        ]
+
+        response = self.client.post('/api/consumers/bulk-upsert/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(Consumer.objects.filter(email__in=['old@test.com', 'fresh@test.com']).count(), 2)
+        self.assertEqual(Consumer.objects.get(email='old@test.com').first_name, 'New')
+
+    def test_bulk_upsert_validates_rows(self):
+        """Test invalid rows reject the whole batch"""
+        data = [{'email': 'not-an-email', 'first_name': 'A', 'last_name': 'B'}]
+        response = self.client.post('/api/consumers/bulk-upsert/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Consumer.objects.filter(email='not-an-email').exists())
+
+    def test_create_return_with_inline_consumer(self):
+        """Test a return can name its consumer by email instead of id"""
+        consumer = {'email': 'new@test.com', 'first_name': 'Jane', 'last_name': 'Smith'}
+
+        response = self.create_return('RET-1', consumer=consumer)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['consumer'], Consumer.objects.get(email='new@test.com').id)
+
+        response = self.create_return('RET-2', consumer=consumer)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Consumer.objects.filter(email='new@test.com').count(), 1)
+
+    def test_patch_return_with_inline_consumer(self):
+        """Test updating a return can also name its consumer by email"""
+        existing = Consumer.objects.create(email='old@test.com', first_name='Old', last_name='Name')
+        return_id = self.create_return('RET-1', consumer=existing.id).data['id']
+
+        response = self.client.patch(f'/api/returns/{return_id}/', {
+            'consumer': {'email': 'new@test.com', 'first_name': 'Jane', 'last_name': 'Smith'}
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Return.objects.get(pk=return_id).consumer.email, 'new@test.com')
+
+    def test_inline_consumer_query_count_matches_existing(self):
+        """Test a new consumer costs no more queries than an existing one"""
+        existing = Consumer.objects.create(email='old@test.com', first_name='Old', last_name='Name')
+
+        with CaptureQueriesContext(connection) as by_id:
+            self.create_return('RET-1', consumer=existing.id)
+        with CaptureQueriesContext(connection) as inline:
+            self.create_return('RET-2', consumer={'email': 'new@test.com', 'first_name': 'Jane', 'last_name': 'Smith'})
+
+        self.assertEqual(len(inline.captured_queries), len(by_id.captured_queries))
+
+
+class RendererTest(APITestCase):
+    """Test orjson/MessagePack content negotiation and compression"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(self.user)
+        merchant = Merchant.objects.create(name='Test Store', email='test@store.com')
+        consumer = Consumer.objects.create(email='customer@test.com', first_name='John', last_name='Doe')
+        products = Product.objects.upsert(merchant, {f'SKU-{i}': f'Product {i}' for i in range(3)})
+
+        # A representative page: PAGE_SIZE returns with three items each
+        for i in range(20):
+            return_obj = Return.objects.create(
+                merchant=merchant,
+                consumer=consumer,
+                order_number=f'ORD-{i}',
+                authorization_code=f'RET-{i:06d}',
+                refund_amount='129.97'
+            )
+            ReturnItem.objects.bulk_create([
+                ReturnItem(
+                    return_obj=return_obj,
+                    product=product,
+                    quantity=1,
+                    unit_price='43.32',
+                    return_reason=ReturnItem.REASON_UNWANTED
+                )
+                for product in products.values()
+            ])
+
+        self.page = {
+            'count': 20,
+            'next': None,
+            'previous': None,
+            'results': ReturnSerializer(Return.objects.prefetch_related('items__product'), many=True).data,
+        }
+
+    def test_orjson_matches_stdlib_json(self):
+        """Test the orjson renderer produces the same document as DRF's"""
+        self.assertEqual(
+            json.loads(ORJSONRenderer().render(self.page)),
+            json.loads(JSONRenderer().render(self.page))
+        )
+
+    def test_msgpack_negotiation(self):
+        """Test clients can ask for and send MessagePack"""
+        response = self.client.get('/api/returns/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(len(msgpack.unpackb(response.content)['results']), 20)
+
+        response = self.client.post('/api/consumers/', {
+            'email': 'new@test.com',
+            'first_name': 'Jane',
+            'last_name': 'Smith'
+        }, format='msgpack')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_invalid_msgpack_rejected(self):
+        """Test malformed bodies are a 400, not a 500"""
+        response = self.client.post('/api/consumers/', b'\xc1', content_type='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_gzip_compression(self):
+        """Test responses are compressed when the client accepts gzip"""
+        response = self.client.get('/api/returns/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['results']), 20)
+
+    def test_renderer_size_and_speed_benchmark(self):
+        """Benchmark: encode time and bytes for a page of returns per renderer"""
+        def measure(renderer, iterations=200):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                content = renderer.render(self.page)
+            return (time.perf_counter() - start) / iterations, len(content), len(gzip.compress(content))
+
+        stdlib_time, stdlib_bytes, stdlib_gzip = measure(JSONRenderer())
+        orjson_time, orjson_bytes, _ = measure(ORJSONRenderer())
+        msgpack_time, msgpack_bytes, msgpack_gzip = measure(MessagePackRenderer())
+
+        self.assertLess(orjson_time, stdlib_time)
+        self.assertLess(msgpack_time, stdlib_time)
+        self.assertEqual(orjson_bytes, stdlib_bytes)
+        self.assertLess(msgpack_bytes, stdlib_bytes)
+        self.assertLess(stdlib_gzip, stdlib_bytes / 4)
+        self.assertLess(msgpack_gzip, stdlib_bytes / 4)
+
+
+class ReturnAdminTest(TestCase):
+    """Test the admin stays usable on large tables"""
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(username='admin', password='adminpass', email='admin@test.com')
+        self.client.force_login(self.admin_user)
+        self.merchant = Merchant.objects.create(name='Test Store', email='test@store.com')
+        self.consumer = Consumer.objects.create(email='customer@test.com', first_name='John', last_name='Doe')
+        product = Product.objects.create(merchant=self.merchant, sku='SKU-1', name='Shirt')
+        self.returns = [
+            Return.objects.create(
+                merchant=self.merchant,
+                consumer=self.consumer,
+                order_number=f'ORD-{i}',
+                authorization_code=f'RET-{i}',
+                refund_amount=10.00
+            )
+            for i in range(3)
+        ]
+        for return_obj in self.returns:
+            ReturnItem.objects.create(
+                return_obj=return_obj,
+                product=product,
+                unit_price=10.00,
+                return_reason=ReturnItem.REASON_UNWANTED
+            )
+
+    def test_changelists_and_change_form_load(self):
+        """Test the busy admin pages render"""
+        for url in ['/admin/returns/return/', '/admin/returns/returnitem/', f'/admin/returns/return/{self.returns[0].id}/change/']:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+
+    def test_changelist_query_count_independent_of_rows(self):
+        """Test related objects are joined, not fetched per row"""
+        with CaptureQueriesContext(connection) as few:
+            self.client.get('/admin/returns/returnitem/')
+        Return.objects.filter(pk=self.returns[0].pk).delete()
+        with CaptureQueriesContext(connection) as fewer:
+            self.client.get('/admin/returns/returnitem/')
+        self.assertEqual(len(few.captured_queries), len(fewer.captured_queries))
+
+    def test_change_form_inline_joins_products(self):
+        """Test inline rows don't each load their product separately"""
+        url = f'/admin/returns/return/{self.returns[0].id}/change/'
+        self.client.get(url)  # Warm the content type cache
+        with CaptureQueriesContext(connection) as one_item:
+            self.client.get(url)
+
+        product = Product.objects.create(merchant=self.merchant, sku='SKU-2', name='Hat')
+        for _ in range(2):
+            ReturnItem.objects.create(
+                return_obj=self.returns[0],
+                product=product,
+                unit_price=10.00,
+                return_reason=ReturnItem.REASON_UNWANTED
+            )
+        with CaptureQueriesContext(connection) as three_items:
+            response = self.client.get(url)
+
+        self.assertEqual(len(three_items.captured_queries), len(one_item.captured_queries))
+        self.assertContains(response, 'Hat (SKU-2)', count=2)
+        self.assertContains(response, f'/admin/autocomplete/?merchant={self.merchant.id}')
+
+    def test_product_autocomplete_limited_to_merchant(self):
+        """Test a return's product picker only searches its merchant's catalog"""
+        other = Merchant.objects.create(name='Other Store', email='other@store.com', api_key='other-key')
+        Product.objects.create(merchant=other, sku='SKU-9', name='Other Shirt')
+        params = {'app_label': 'returns', 'model_name': 'returnitem', 'field_name': 'product', 'term': 'Shirt'}
+
+        response = self.client.get('/admin/autocomplete/', params)
+        self.assertEqual(len(response.json()['results']), 2)
+
+        response = self.client.get('/admin/autocomplete/', {**params, 'merchant': self.merchant.id})
+        self.assertEqual([result['text'] for result in response.json()['results']], ['Shirt (SKU-1)'])
+
+    def test_bulk_action_logs_events(self):
+        """Test bulk status actions update in place and write status events"""
+        response = self.client.post('/admin/returns/return/', {
+            'action': 'mark_authorized',
+            '_selected_action': [self.returns[0].id, self.returns[1].id],
+        })
+        self.assertEqual(response.status_code, 302)
+
+        self.assertEqual(Return.objects.filter(status=Return.STATUS_AUTHORIZED).count(), 2)
+        self.assertEqual(ReturnStatusEvent.objects.filter(to_status=Return.STATUS_AUTHORIZED).count(), 2)
+        self.assertEqual(Job.objects.filter(payload__status=Return.STATUS_AUTHORIZED).count(), 2)
+
+    def test_bulk_action_leaves_legacy_duration_unknown(self):
+        """Test returns without status_changed_at only fall back to initiated_at from INITIATED"""
+        Return.objects.filter(pk=self.returns[0].pk).update(status_changed_at=None)
+        Return.objects.filter(pk=self.returns[1].pk).update(status=Return.STATUS_AUTHORIZED, status_changed_at=None)
+
+        Return.objects.filter(pk__in=[self.returns[0].pk, self.returns[1].pk]).transition(Return.STATUS_CANCELLED)
+
+        seconds = dict(
+            ReturnStatusEvent.objects.filter(to_status=Return.STATUS_CANCELLED)
+            .values_list('return_obj_id', 'seconds_in_from_status')
+        )
+        self.assertIsNotNone(seconds[self.returns[0].pk])
+        self.assertIsNone(seconds[self.returns[1].pk])
+
+    def test_bulk_action_skips_invalid_transitions(self):
+        """Test actions only move returns from the allowed status"""
+        self.client.post('/admin/returns/return/', {
+            'action': 'mark_completed',
+            '_selected_action': [return_obj.id for return_obj in self.returns],
+        })
+        self.assertFalse(Return.objects.filter(status=Return.STATUS_COMPLETED).exists())
+
+    def test_paginator_count_not_truncated(self):
+        """Test counts past the paginator's limit still reach every row"""
+        paginator = EstimatedCountPaginator(Return.objects.all(), 1)
+        paginator.count_limit = 2
+        self.assertEqual(paginator.count, 3)
+        self.assertEqual(paginator.num_pages, 3)
+
+        paginator = EstimatedCountPaginator(Return.objects.filter(order_number='ORD-1'), 1)
+        paginator.count_limit = 2
+        self.assertEqual(paginator.count, 1)
+
+
+class LabelRenderingTest(APITestCase):
+    """Test bulk drop-off label rendering"""
+
+    def setUp(self):
+        caches['labels'].clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client.force_authenticate(self.user)
+        merchant = Merchant.objects.create(name='Test Store', email='test@store.com')
+        consumer = Consumer.objects.create(email='customer@test.com', first_name='John', last_name='Doe')
+        self.returns = [
+            Return.objects.create(
+                merchant=merchant,
+                consumer=consumer,
+                order_number=f'ORD-{i}',
+                authorization_code=f'RET-{i:04d}',
+                refund_amount=10.00,
+                status=Return.STATUS_AUTHORIZED
+            )
+            for i in range(3)
+        ]
+
+    def test_labels_endpoint(self):
+        """Test labels come back as SVG in the requested order"""
+        ids = [self.returns[2].id, self.returns[0].id]
+        response = self.client.post('/api/returns/labels/', {'ids': ids}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([label['id'] for label in response.data], ids)
+        self.assertEqual(response.data[0]['authorization_code'], 'RET-0002')
+        self.assertIn('<svg', response.data[0]['svg'])
+
+    def test_unencodable_code_reported_per_label(self):
+        """Test a code outside Code128 fails only its own label"""
+        Return.objects.filter(pk=self.returns[1].pk).update(authorization_code='RET-É')
+        ids = [return_obj.id for return_obj in self.returns]
+
+        response = self.client.post('/api/returns/labels/', {'ids': ids}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([label['svg'] is None for label in response.data], [False, True, False])
+        self.assertIsNone(response.data[0]['error'])
+        self.assertIn('Code128', response.data[1]['error'])
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            stderr = StringIO()
+            call_command('render_labels', output_dir, '--status=AUTHORIZED', '--workers=1', stdout=StringIO(), stderr=stderr)
+            files = sorted(path.name for path in Path(output_dir).iterdir())
+        self.assertEqual(files, ['RET-0000.svg', 'RET-0002.svg'])
+        self.assertIn("'RET-É'", stderr.getvalue())
+
+    def test_labels_are_cached_by_code(self):
+        """Test a label is only rendered once"""
+        labels.render_labels(['RET-0000'])
+        with mock.patch('returns.labels.render_label') as render_label:
+            self.assertIn('<svg', labels.render_labels(['RET-0000'])['RET-0000'])
+        render_label.assert_not_called()
+
+    def test_process_pool_matches_inline_rendering(self):
+        """Test batches rendered on the pool are identical to inline output"""
+        codes = [f'RET-{i:04d}' for i in range(8)]
+        with mock.patch('returns.labels.POOL_THRESHOLD', 1):
+            pooled = labels.render_labels(codes, workers=2)
+        self.assertEqual(pooled, {code: labels.render_label(code) for code in codes})
+
+    def test_shared_pool_reused_across_batches(self):
+        """Test request-path batches share one long-lived pool"""
+        self.addCleanup(lambda: labels._pool and labels._discard_shared_pool(labels._pool))
+        with mock.patch('returns.labels.POOL_THRESHOLD', 1), mock.patch('returns.labels._shared_pool_size', return_value=2):
+            first = labels.render_labels(['RET-0000', 'RET-0001'])
+            pool = labels._pool
+            second = labels.render_labels(['RET-0002', 'RET-0003'])
+
+        self.assertIsNotNone(pool)
+        self.assertIs(labels._pool, pool)
+        self.assertEqual({**first, **second}, {code: labels.render_label(code) for code in [*first, *second]})
+
+    def test_broken_shared_pool_falls_back_inline(self):
+        """Test a dead pool is replaced and the batch still renders"""
+        pool = mock.Mock()
+        pool.map.side_effect = BrokenProcessPool()
+        with mock.patch('returns.labels.POOL_THRESHOLD', 1), mock.patch('returns.labels._shared_pool_size', return_value=2), \
+                mock.patch('returns.labels._pool', pool):
+            rendered = labels.render_labels(['RET-0000'])
+            self.assertIsNone(labels._pool)
+
+        self.assertEqual(rendered, {'RET-0000': labels.render_label('RET-0000')})
+        pool.shutdown.assert_called_once_with(wait=False)
+
+    def test_render_labels_command(self):
+        """Test the command writes one SVG per selected return"""
+        with tempfile.TemporaryDirectory() as output_dir:
+            call_command('render_labels', output_dir, '--status=AUTHORIZED', '--workers=1', stdout=StringIO())
+            files = sorted(path.name for path in Path(output_dir).iterdir())
+        self.assertEqual(files, ['RET-0000.svg', 'RET-0001.svg', 'RET-0002.svg'])
+
+
+class ConsumerRiskTest(ReturnFilingTestCase):
+    """Test consumer return-abuse scoring"""
+
+    def test_counters_updated_on_create(self):
+        """Test creating returns bumps today's counters in one row"""
+        self.create_return('RET-1', [item(reason='UNWANTED'), item(reason='DEFECTIVE')], refund='100.00')
+        self.create_return('RET-2', [item(reason='WRONG_ITEM')], refund='50.00')
+
+        stats = ConsumerReturnStats.objects.get(consumer=self.consumer)
+        self.assertEqual(stats.returns, 2)
+        self.assertEqual(stats.items, 3)
+        self.assertEqual(stats.flagged_items, 2)
+        self.assertEqual(str(stats.refund_total), '150.00')
+
+    def test_create_response_includes_risk(self):
+        """Test the score is available as soon as the return is created"""
+        response = self.create_return('RET-1')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['consumer_risk']['returns_30d'], 1)
+        self.assertEqual(response.data['consumer_risk']['flagged_item_share_90d'], 1.0)
+
+    def test_single_ordinary_return_is_low(self):
+        """Test one unwanted item doesn't flag a first-time customer"""
+        self.create_return('RET-1', [item(reason='UNWANTED')], refund='100.00')
+
+        response = self.client.get(f'/api/consumers/{self.consumer.id}/risk/')
+        self.assertEqual(response.data['level'], 'LOW')
+        self.assertEqual(response.data['flagged_item_share_90d'], 1.0)
+
+    def test_serial_returner_scores_high(self):
+        """Test frequent discretionary returns raise the score"""
+        for i in range(10):
+            self.create_return(f'RET-{i}', refund='100.00')
+
+        response = self.client.get(f'/api/consumers/{self.consumer.id}/risk/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['score'], 100)
+        self.assertEqual(response.data['level'], 'HIGH')
+        self.assertEqual(response.data['refund_total_90d'], '1000.00')
+
+    def test_windows_slide(self):
+        """Test counters outside the windows stop counting"""
+        today = timezone.localdate()
+        ConsumerReturnStats.objects.create(consumer=self.consumer, day=today - timedelta(days=45), returns=3, items=3)
+        ConsumerReturnStats.objects.create(consumer=self.consumer, day=today - timedelta(days=120), returns=7, items=7)
+
+        response = self.client.get(f'/api/consumers/{self.consumer.id}/risk/')
+        self.assertEqual(response.data['returns_30d'], 0)
+        self.assertEqual(response.data['returns_90d'], 3)
+        self.assertEqual(response.data['level'], 'LOW')
+
+    def test_counters_updated_outside_the_api(self):
+        """Test returns and items saved through the ORM (e.g. the admin) are counted too"""
+        return_obj = Return.objects.create(
+            merchant=self.merchant,
+            consumer=self.consumer,
+            order_number='ORD-1',
+            authorization_code='RET-1',
+            refund_amount='40.00'
+        )
+        product = Product.objects.create(merchant=self.merchant, sku='SKU-1', name='Shirt')
+        ReturnItem.objects.create(return_obj=return_obj, product=product, unit_price='40.00', return_reason='DEFECTIVE')
+
+        stats = ConsumerReturnStats.objects.get(consumer=self.consumer)
+        self.assertEqual(stats.returns, 1)
+        self.assertEqual(stats.items, 1)
+        self.assertEqual(stats.flagged_items, 0)
+        self.assertEqual(str(stats.refund_total), '40.00')
+
+    def test_refund_edit_adjusts_counters(self):
+        """Test changing a refund moves the refund total by the difference"""
+        response = self.create_return('RET-1', refund='100.00')
+        self.client.patch(f'/api/returns/{response.data["id"]}/', {'refund_amount': '30.00'}, format='json')
+
+        stats = ConsumerReturnStats.objects.get(consumer=self.consumer)
+        self.assertEqual(stats.returns, 1)
+        self.assertEqual(str(stats.refund_total), '30.00')
+
+        # Saves that leave the refund alone don't touch it
+        Return.objects.get(pk=response.data['id']).save()
+        stats.refresh_from_db()
+        self.assertEqual(str(stats.refund_total), '30.00')
@@ -0,0 +1,104 @@
+import time
+from collections import namedtuple
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+from rest_framework.throttling import BaseThrottle
+from .models import Merchant
+
+
+RateLimit = namedtuple('RateLimit', ['limit', 'remaining'])
+
+
+class MerchantRateThrottle(BaseThrottle):
+    """
+    Token bucket throttle keyed by the calling merchant.
+
+    Requests authenticated with a merchant API key draw from that merchant's
+    bucket, sized by Merchant.rate_limit_per_minute / rate_limit_burst. Other
+    authenticated users and anonymous clients get their own bucket with the
+    default limits, so one noisy integration never starves the others.
+
+    The bucket is stored in the 'throttle' cache as a single integer (the
+    "theoretical arrival time" of GCRA, in microseconds) and advanced with
+    atomic increments, so no locking is needed across processes.
+    """
+    cache = ConnectionProxy(caches, 'throttle')
+    timer = time.time
+    cache_format = 'throttle_bucket_%(scope)s_%(ident)s'
+
+    default_rate_per_minute = 600
+    default_burst = 60
+
+    # Idle buckets are dropped after this; a stale bucket is simply full
+    bucket_ttl = 60 * 60
+
+    def get_bucket(self, request):
+        """Return (scope, ident, rate_per_minute, burst) for this request"""
+        if isinstance(request.auth, Merchant):
+            merchant = request.auth
+            return ('merchant', merchant.pk,
+                    merchant.rate_limit_per_minute, merchant.rate_limit_burst)
+
+        if request.user and request.user.is_authenticated:
+            return ('user', request.user.pk,
+                    self.default_rate_per_minute, self.default_burst)
+
+        return ('anon', self.get_ident(request),
+                self.default_rate_per_minute, self.default_burst)
+
+    def allow_request(self, request, view):
+        scope, ident, rate, burst = self.get_bucket(request)
+
+        # A rate of 0 disables limiting for this caller
+        if not rate:
+            return True
+
+        burst = max(burst, 1)
+        interval = 60_000_000 // rate
+        capacity = burst * interval
+        now = int(self.timer() * 1_000_000)
+        key = self.cache_format % {'scope': scope, 'ident': ident}
+
+        if self.cache.add(key, now + interval, self.bucket_ttl):
+            tat = now + interval
+        else:
+            try:
+                tat = self.cache.incr(key, interval)
+            except ValueError:
+                # Expired between add() and incr()
+                tat = now + interval
+                self.cache.set(key, tat, self.bucket_ttl)
+
+            if tat < now + interval:
+                # The bucket sat idle and is full again; restart it from now.
+                # Concurrent resets can lose a token's worth of accounting,
+                # which only ever errs on the side of letting a request in.
+                tat = now + interval
+                self.cache.set(key, tat, self.bucket_ttl)
+
+        if tat - now > capacity:
+            # Give the token back so rejected requests don't drain the bucket
+            self.cache.decr(key, interval)
+            self.wait_us = tat - now - capacity
+            request.rate_limit = RateLimit(limit=burst, remaining=0)
+            return False
+
+        request.rate_limit = RateLimit(limit=burst, remaining=(capacity - (tat - now)) // interval)
+        return True
+
+    def wait(self):
+        return self.wait_us / 1_000_000
+
+
+class RateLimitHeadersMixin:
+    """Expose the caller's remaining quota on every response"""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+
+        rate_limit = getattr(request, 'rate_limit', None)
+        if rate_limit is not None:
+            response['X-RateLimit-Limit'] = rate_limit.limit
+            response['X-RateLimit-Remaining'] = rate_limit.remaining
+
+        return response
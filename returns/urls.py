@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MerchantViewSet, ConsumerViewSet, ReturnViewSet
+from .views import MerchantViewSet, ConsumerViewSet, ProductViewSet, ReturnViewSet
 
 router = DefaultRouter()
 router.register(r'merchants', MerchantViewSet, basename='merchant')
 router.register(r'consumers', ConsumerViewSet, basename='consumer')
+router.register(r'products', ProductViewSet, basename='product')
 router.register(r'returns', ReturnViewSet, basename='return')
 
 urlpatterns = [
@@ -1,36 +1,159 @@
+import math
+from datetime import timedelta
 from rest_framework import viewsets
 from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from django.db import connections
+from django.db.models import Aggregate, Count, FloatField, Max, Prefetch, Sum
 from django.utils import timezone
-from .models import Merchant, Consumer, Return, ReturnItem
-from .serializers import MerchantSerializer, ConsumerSerializer, ReturnSerializer
+from django.utils.dateparse import parse_datetime
+from .labels import render_labels
+from .models import Merchant, Consumer, Product, Return, ReturnItem, ReturnStatusEvent
+from .permissions import ReadOnlyForMerchantKeys
+from .risk import consumer_risk
+from .serializers import (
+    MerchantSerializer, ConsumerSerializer, ConsumerRiskSerializer, ConsumerUpsertSerializer, LabelRequestSerializer,
+    ProductSerializer, ReturnSerializer
+)
+from .throttling import RateLimitHeadersMixin
 
 
-class MerchantViewSet(viewsets.ModelViewSet):
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+class PercentileDisc(Aggregate):
+    """PostgreSQL's PERCENTILE_DISC, the same nearest-rank percentile as percentile()"""
+    function = 'PERCENTILE_DISC'
+    template = '%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = FloatField()
+
+    def __init__(self, expression, pct, **extra):
+        super().__init__(expression, fraction=float(pct) / 100, **extra)
+
+
+class MerchantScopedMixin:
+    """
+    Limit callers authenticated with a merchant API key to their own merchant's
+    rows; staff users (token or session auth) still see everything.
+    """
+    merchant_lookup = 'merchant'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if isinstance(self.request.auth, Merchant):
+            queryset = queryset.filter(**{self.merchant_lookup: self.request.auth.pk})
+        return queryset
+
+
+class MerchantViewSet(MerchantScopedMixin, RateLimitHeadersMixin, viewsets.ModelViewSet):
     """
     ViewSet for Merchant CRUD operations
     """
     queryset = Merchant.objects.all()
     serializer_class = MerchantSerializer
+    permission_classes = [IsAuthenticated, ReadOnlyForMerchantKeys]
+    merchant_lookup = 'pk'
 
 
-class ConsumerViewSet(viewsets.ModelViewSet):
+class ConsumerViewSet(MerchantScopedMixin, RateLimitHeadersMixin, viewsets.ModelViewSet):
     """
     ViewSet for Consumer CRUD operations
     """
     queryset = Consumer.objects.all()
     serializer_class = ConsumerSerializer
+    merchant_lookup = 'returns__merchant'
+
+    def get_queryset(self):
+        # A consumer with several returns at the merchant would otherwise repeat
+        queryset = super().get_queryset()
+        if isinstance(self.request.auth, Merchant):
+            queryset = queryset.distinct()
+        return queryset
+
+    @action(detail=False, methods=['post'], url_path='bulk-upsert')
+    def bulk_upsert(self, request):
+        """
+        Create or update a list of consumers, matched by email. Merchant API
+        keys only update consumers who already have a return at the merchant.
+        """
+        serializer = ConsumerUpsertSerializer(data=request.data, many=True, max_length=1000)
+        serializer.is_valid(raise_exception=True)
 
+        merchant = request.auth if isinstance(request.auth, Merchant) else None
+        consumers = Consumer.objects.upsert(serializer.validated_data, merchant=merchant)
 
-class ReturnViewSet(viewsets.ModelViewSet):
+        # Re-read so existing consumers report their original created_at
+        queryset = Consumer.objects.filter(pk__in=[consumer.pk for consumer in consumers.values()])
+        return Response(ConsumerSerializer(queryset, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def risk(self, request, pk=None):
+        """Return-abuse risk score from the consumer's 30/90-day return counters"""
+        consumer = self.get_object()
+        return Response(ConsumerRiskSerializer(consumer_risk(consumer.id)).data)
+
+
+class ProductViewSet(MerchantScopedMixin, RateLimitHeadersMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for browsing the per-merchant product catalog
+    """
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    filterset_fields = ['merchant', 'sku']
+
+    @action(detail=True, methods=['get'], url_path='return-stats')
+    def return_stats(self, request, pk=None):
+        """Items and units returned for this SKU over the last `days` days (default 90), by reason"""
+        product = self.get_object()
+
+        days = request.query_params.get('days', '90')
+        if not days.isdigit():
+            return Response(
+                {'error': 'days must be a whole number'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = (
+            ReturnItem.objects.filter(product=product, created_at__gte=timezone.now() - timedelta(days=int(days)))
+            .values('return_reason')
+            .annotate(items=Count('id'), units=Sum('quantity'))
+            .order_by('return_reason')
+        )
+        by_reason = {row['return_reason']: {'items': row['items'], 'units': row['units']} for row in rows}
+
+        return Response({
+            'product': product.id,
+            'sku': product.sku,
+            'days': int(days),
+            'items': sum(row['items'] for row in by_reason.values()),
+            'units': sum(row['units'] for row in by_reason.values()),
+            'by_reason': by_reason,
+        })
+
+
+class ReturnViewSet(MerchantScopedMixin, RateLimitHeadersMixin, viewsets.ModelViewSet):
     """
     ViewSet for Return CRUD operations with nested items
     """
-    queryset = Return.objects.select_related('merchant', 'consumer').prefetch_related('items').all()
+    queryset = Return.objects.select_related('merchant', 'consumer').prefetch_related(
+        Prefetch('items', queryset=ReturnItem.objects.select_related('product'))
+    ).all()
     serializer_class = ReturnSerializer
     filterset_fields = ['status', 'merchant']
 
+    def create(self, request, *args, **kwargs):
+        """Create a return; the response also carries the consumer's risk score"""
+        response = super().create(request, *args, **kwargs)
+        response.data['consumer_risk'] = ConsumerRiskSerializer(consumer_risk(response.data['consumer'])).data
+        return response
+
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         """Approve a return (transition to AUTHORIZED status)"""
@@ -81,4 +204,122 @@ class ReturnViewSet(viewsets.ModelViewSet):
         return_obj.save()
 
         serializer = self.get_serializer(return_obj)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def labels(self, request):
+        """
+        Render Code128 drop-off labels (SVG) for a batch of returns, in the
+        order requested. Returns whose code can't be encoded get an error
+        instead of an svg, without failing the rest of the batch.
+        """
+        serializer = LabelRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+
+        codes = dict(self.get_queryset().filter(pk__in=ids).values_list('pk', 'authorization_code'))
+        svgs = render_labels(codes.values())
+
+        results = []
+        for pk in dict.fromkeys(ids):
+            if pk not in codes:
+                continue
+            svg = svgs.get(codes[pk])
+            results.append({
+                'id': pk,
+                'authorization_code': codes[pk],
+                'svg': svg,
+                'error': None if svg is not None else 'Authorization code cannot be encoded as Code128',
+            })
+        return Response(results)
+
+    @action(detail=False, methods=['get'], url_path='status-durations')
+    def status_durations(self, request):
+        """
+        Time spent in each status of the return flow, as percentiles in seconds.
+
+        Query params: merchant (defaults to, and with an API key must be, the
+        API-key merchant), since and until (ISO 8601, default the last 30 days).
+        """
+        merchant_id = request.query_params.get('merchant')
+        if merchant_id is None and isinstance(request.auth, Merchant):
+            merchant_id = request.auth.pk
+        if not str(merchant_id or '').isdigit():
+            return Response(
+                {'error': 'merchant is required and must be an id'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if isinstance(request.auth, Merchant) and int(merchant_id) != request.auth.pk:
+            return Response(
+                {'error': 'API keys can only read their own merchant\'s durations'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        until = timezone.now()
+        since = until - timedelta(days=30)
+        for param in ('since', 'until'):
+            value = request.query_params.get(param)
+            if value is None:
+                continue
+            parsed = parse_datetime(value)
+            if parsed is None:
+                return Response(
+                    {'error': f'{param} must be an ISO 8601 datetime'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            if param == 'since':
+                since = parsed
+            else:
+                until = parsed
+
+        flow = [
+            Return.STATUS_INITIATED,
+            Return.STATUS_AUTHORIZED,
+            Return.STATUS_DROPPED_OFF,
+            Return.STATUS_PROCESSING,
+        ]
+        events = ReturnStatusEvent.objects.filter(
+            merchant_id=merchant_id,
+            from_status__in=flow,
+            occurred_at__gte=since,
+            occurred_at__lt=until,
+        )
+
+        if connections[events.db].vendor == 'postgresql':
+            # Aggregate in the database rather than shipping every duration over
+            rows = events.order_by().values('from_status').annotate(
+                count=Count('seconds_in_from_status'),
+                p50=PercentileDisc('seconds_in_from_status', 50),
+                p90=PercentileDisc('seconds_in_from_status', 90),
+                p99=PercentileDisc('seconds_in_from_status', 99),
+                max=Max('seconds_in_from_status'),
+            )
+            stats = {row.pop('from_status'): row for row in rows}
+        else:
+            durations = {status_name: [] for status_name in flow}
+            for from_status, seconds in events.values_list('from_status', 'seconds_in_from_status').iterator(chunk_size=10000):
+                if seconds is not None:
+                    durations[from_status].append(seconds)
+
+            stats = {}
+            for status_name, values in durations.items():
+                values.sort()
+                stats[status_name] = {
+                    'count': len(values),
+                    'p50': percentile(values, 50),
+                    'p90': percentile(values, 90),
+                    'p99': percentile(values, 99),
+                    'max': values[-1] if values else None,
+                }
+
+        empty = {'count': 0, 'p50': None, 'p90': None, 'p99': None, 'max': None}
+        results = [{'status': status_name, **stats.get(status_name, empty)} for status_name in flow]
+
+        return Response({
+            'merchant': int(merchant_id),
+            'since': since,
+            'until': until,
+            'statuses': results,
+        })